@@ -5,15 +5,24 @@
 # TODO: 这既是微信 API 接口的简易封装，数量不多那么可堪一用；也是 ServiceRequest 的一个使用示例，快速对接功能不多的第二方服务接口。
 
 import logging
-from typing import Literal
+from asyncio import Task, ensure_future
+from dataclasses import dataclass, field
+from threading import Lock, Thread
+from time import time
+from typing import ClassVar, Literal
 
 from django.conf import settings
 from django.db.models import IntegerChoices
-from zeraora.string import StringBuilder
 
 from commons.exceptions import MeowViewException
+from utils.cache import Cacher, cacher
 from utils.http import HTTPMethod
-from utils.request import ServiceRequest
+from utils.request import CircuitBreaker, RetryPolicy, ServiceRequest
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
 
 logger = logging.getLogger('project.api.wechat')
 
@@ -22,6 +31,9 @@ logger = logging.getLogger('project.api.wechat')
 # https://developers.weixin.qq.com/doc/oplatform/Return_codes/Return_code_descriptions_new.html
 class WeChatErrcode(IntegerChoices):
     EXCEED_API_RATE = 45011, '请求过快'
+    ACCESS_TOKEN_EXPIRED = 42001, 'access_token超时'
+    INVALID_ACCESS_TOKEN = 40014, '不合法的access_token'
+    INVALID_CREDENTIAL = 40001, 'access_token无效'
     LOGGING_BLOCKED = 40226, '用户无法登录'
     INVALID_CODE = 40029, 'code无效'
     SUCCEED = 0, '成功'
@@ -35,6 +47,16 @@ class WeChatRequest(ServiceRequest):
     """
 
     endpoint = 'https://api.weixin.qq.com'
+    label = '微信API'
+    typed: ClassVar[dict[str, type['TypedWeChatResponse']]] = {}
+    """按 API 路径登记的类型化响应，只用于解析成功的响应，其余响应解析为 :class:`WeChatResponse` 。"""
+    timeout = (3.05, 5)
+    retry = RetryPolicy(3, errcodes=(WeChatErrcode.EXCEED_API_RATE, WeChatErrcode.FAILED))
+    retry_policies: ClassVar[dict[str, RetryPolicy | None]] = {
+        # js_code 只能使用一次，已经发出的请求即使失败也可能已经消耗了它，因此只在连接失败（请求尚未发出）时重试。
+        '/sns/jscode2session': RetryPolicy(3, methods=()),
+    }
+    breaker = CircuitBreaker(threshold=5, cooldown=30)
 
     def __init__(
         self,
@@ -49,31 +71,46 @@ class WeChatRequest(ServiceRequest):
         """
         执行请求，返回响应。
 
-        - 详细记录请求细节与响应结果（发送到日志系统）。
+        - 按抽样比例记录请求细节与响应结果（发送到日志系统），并隐去密钥、令牌等敏感字段。
         - 对底层 API 的错误处理。
+        - 按 :attr:`retry` 退避重试，上游持续不可用时由 :attr:`breaker` 快速失败。
         """
+        self._log_request(logger)
         try:
-            logger.info(
-                StringBuilder()
-                .writeline(f'微信API：{self.method} {self.url}')
-                .writes(f'{title}: {self.headers[title]}\n' for title in self.headers)
-                .writes(f'{k} = {v}\n' for k, v in self.kwargs.items())
-                .build()
-            )
-            response = self._request()
-        except Exception as e:
-            logger.exception(f'微信API：{self.method} {self.url} ERROR', exc_info=e)
-            raise MeowViewException(msg='微信API不可用', http=False) from e
+            return self._retrying(self._parse)
+        except MeowViewException:
+            raise
+        except Exception as e:  # noqa: BLE001 -- 任何失败都转换为 MeowViewException，已由 _log_error 记录
+            self._log_error(logger, e)
+            # 原始异常的信息带有密钥，已经隐去后记录，不再链接到新的异常上，以免被其它地方连同堆栈一起记录。
+            raise MeowViewException(msg='微信API不可用', http=False) from None
+
+    async def asend(self):
+        """
+        :meth:`send` 的异步版本。
+        """
+        self._log_request(logger)
+        try:
+            return await self._aretrying(self._parse)
+        except (MeowViewException, TypeError):
+            raise
+        except Exception as e:  # noqa: BLE001 -- 任何失败都转换为 MeowViewException，已由 _log_error 记录
+            self._log_error(logger, e)
+            # 原始异常的信息带有密钥，已经隐去后记录，不再链接到新的异常上，以免被其它地方连同堆栈一起记录。
+            raise MeowViewException(msg='微信API不可用', http=False) from None
+
+    def _parse(self, response) -> 'WeChatResponse':
+        """
+        解析 ``requests`` 或 ``httpx`` 的响应。安装了 `orjson <https://pypi.org/project/orjson/>`_ 时用它直接解析响应的字节。
+        """
         if response.status_code // 100 != 2:
+            self._log_response(logger, response)
             raise MeowViewException(msg='微信API不可用', http=response.status_code)
         try:
-            logger.info(
-                StringBuilder()
-                .writeline(f'微信API：{self.method} {self.url} {response.status_code}')
-                .writeline(response.text)
-                .build()
-            )
-            body = response.json()
+            body = _loads(response.content)
+            self._log_response(logger, response, body)
+            if (typed := self.typed.get(self.path)) is not None and (resp := typed.parse(body)) is not None:
+                return resp
             code = int(body.pop('errcode', WeChatErrcode.SUCCEED))
             resp = WeChatResponse(
                 __errcode__=code,
@@ -82,23 +119,52 @@ class WeChatRequest(ServiceRequest):
                 **body,
             )
         except Exception as e:
+            self._log_response(logger, response)
             logger.exception('微信API：响应格式有误', exc_info=e)
             raise MeowViewException(msg='微信API不可用', exc=type(e).__name__) from e
         return resp
 
-    @classmethod
-    def get(cls, api: str, **kwargs):
-        resp = cls('GET', api, **kwargs).send()
+    def _errcode(self, result: 'WeChatResponse') -> int:
+        return result.__errcode__
+
+    @staticmethod
+    def _check(resp: 'WeChatResponse') -> 'WeChatResponse':
         if resp.errcode < WeChatErrcode.SUCCEED:
             raise MeowViewException(msg=resp.errmsg, wxapi=resp.__errcode__, **resp.fields())
         return resp
 
+    @classmethod
+    def get(cls, api: str, **kwargs):
+        return cls._check(cls('GET', api, **kwargs).send())
+
     @classmethod
     def post(cls, api: str, **kwargs):
-        resp = cls('POST', api, **kwargs).send()
-        if resp.errcode < WeChatErrcode.SUCCEED:
-            raise MeowViewException(msg=resp.errmsg, wxapi=resp.__errcode__, **resp.fields())
-        return resp
+        return cls._check(cls('POST', api, **kwargs).send())
+
+    @classmethod
+    async def aget(cls, api: str, **kwargs):
+        return cls._check(await cls('GET', api, **kwargs).asend())
+
+    @classmethod
+    async def apost(cls, api: str, **kwargs):
+        return cls._check(await cls('POST', api, **kwargs).asend())
+
+    @staticmethod
+    def _code2session_params(js_code: str, appid: str | None, secret: str | None) -> dict:
+        return {
+            'appid': appid or settings.WECHAT_APP_ID,
+            'secret': secret or settings.WECHAT_APP_SECRET,
+            'js_code': js_code,
+            'grant_type': 'authorization_code',
+        }
+
+    @staticmethod
+    def _access_token_params(appid: str | None, secret: str | None) -> dict:
+        return {
+            'appid': appid or settings.WECHAT_APP_ID,
+            'secret': secret or settings.WECHAT_APP_SECRET,
+            'grant_type': 'client_credential',
+        }
 
     @classmethod
     def code2session(cls, js_code: str, appid: str | None = None, secret: str | None = None):
@@ -106,15 +172,14 @@ class WeChatRequest(ServiceRequest):
         微信
         `code2session <https://developers.weixin.qq.com/miniprogram/dev/OpenApiDoc/user-login/code2Session.html>`_
         """
-        return cls.get(
-            '/sns/jscode2session',
-            params={
-                'appid': appid or settings.WECHAT_APP_ID,
-                'secret': secret or settings.WECHAT_APP_SECRET,
-                'js_code': js_code,
-                'grant_type': 'authorization_code',
-            },
-        )
+        return cls.get('/sns/jscode2session', params=cls._code2session_params(js_code, appid, secret))
+
+    @classmethod
+    async def acode2session(cls, js_code: str, appid: str | None = None, secret: str | None = None):
+        """
+        :meth:`code2session` 的异步版本。
+        """
+        return await cls.aget('/sns/jscode2session', params=cls._code2session_params(js_code, appid, secret))
 
     @classmethod
     def getAccessToken(cls, appid: str | None = None, secret: str | None = None):
@@ -122,14 +187,208 @@ class WeChatRequest(ServiceRequest):
         微信
         `getAccessToken <https://developers.weixin.qq.com/miniprogram/dev/server/API/mp-access-token/api_getaccesstoken.html>`_
         """
-        return cls.get(
-            '/cgi-bin/token',
-            params={
-                'appid': appid or settings.WECHAT_APP_ID,
-                'secret': secret or settings.WECHAT_APP_SECRET,
-                'grant_type': 'client_credential',
-            },
-        )
+        return cls.get('/cgi-bin/token', params=cls._access_token_params(appid, secret))
+
+    @classmethod
+    async def agetAccessToken(cls, appid: str | None = None, secret: str | None = None):
+        """
+        :meth:`getAccessToken` 的异步版本。
+        """
+        return await cls.aget('/cgi-bin/token', params=cls._access_token_params(appid, secret))
+
+    @classmethod
+    def authorized(cls, method: HTTPMethod | str, api: str, *, token: 'WeChatAccessToken | None' = None, **kwargs):
+        """
+        带上缓存的 access_token 调用需要鉴权的微信 API。微信报告 access_token 无效时，刷新后重试一次。
+
+        :param method: HTTP 方法。
+        :param api: API 路径。
+        :param token: access_token 管理器，默认使用 ``settings.WECHAT_APP_ID`` 对应的。
+        :param kwargs: 其它请求参数，``params`` 只能是字典。
+        """
+        token = token or WeChatAccessToken(request=cls)
+        params = dict(kwargs.pop('params', None) or {})
+        params['access_token'] = token.get()
+        resp = cls._check(cls(method, api, params=params, **kwargs).send())
+        if resp.errcode in WeChatAccessToken.INVALID:
+            params['access_token'] = token.refresh(params['access_token'])
+            resp = cls._check(cls(method, api, params=params, **kwargs).send())
+        return resp
+
+    @classmethod
+    async def aauthorized(
+        cls, method: HTTPMethod | str, api: str, *, token: 'WeChatAccessToken | None' = None, **kwargs
+    ):
+        """
+        :meth:`authorized` 的异步版本。
+        """
+        token = token or WeChatAccessToken(request=cls)
+        params = dict(kwargs.pop('params', None) or {})
+        params['access_token'] = await token.aget()
+        resp = cls._check(await cls(method, api, params=params, **kwargs).asend())
+        if resp.errcode in WeChatAccessToken.INVALID:
+            params['access_token'] = await token.arefresh(params['access_token'])
+            resp = cls._check(await cls(method, api, params=params, **kwargs).asend())
+        return resp
+
+
+class WeChatAccessToken:
+    """
+    缓存在共享缓存中、并在过期前主动刷新的微信 access_token。
+
+    - 令牌的缓存时间是微信返回的有效期减去 ``margin`` 秒；
+    - 剩余有效期不足 ``ahead`` 秒时，在后台刷新，当前请求继续使用旧令牌；
+    - 刷新前需要获取跨进程的锁，因此同一时间只有一个 worker 会向微信请求令牌；
+    - 微信报告令牌无效时，调用 :meth:`refresh` 强制刷新。
+    """
+
+    INVALID = (
+        WeChatErrcode.INVALID_CREDENTIAL,
+        WeChatErrcode.INVALID_ACCESS_TOKEN,
+        WeChatErrcode.ACCESS_TOKEN_EXPIRED,
+    )
+    """表示 access_token 无效的错误码。"""
+
+    _refreshing: ClassVar[dict[str, Lock]] = {}
+    _tasks: ClassVar[set[Task]] = set()
+
+    def __init__(
+        self,
+        appid: str | None = None,
+        secret: str | None = None,
+        *,
+        request: type[WeChatRequest] = WeChatRequest,
+        using: Cacher | None = None,
+        margin: int = 300,
+        ahead: int = 600,
+    ):
+        """
+        :param appid: 小程序的 AppID，默认为 ``settings.WECHAT_APP_ID``。
+        :param secret: 小程序的 AppSecret，默认为 ``settings.WECHAT_APP_SECRET``。
+        :param request: 用于请求令牌的 :class:`WeChatRequest` 或其子类。
+        :param using: 存放令牌的 :class:`Cacher`，默认为 ``cacher``。
+        :param margin: 令牌在缓存中比微信规定的有效期提前多少秒过期。
+        :param ahead: 令牌剩余有效期不足多少秒时开始后台刷新。
+        """
+        self.appid = appid or settings.WECHAT_APP_ID
+        self.secret = secret
+        self.request = request
+        self.cacher = using or cacher
+        self.margin = margin
+        self.ahead = ahead
+        self.key = f'wechat:access_token:{self.appid}'
+
+    def get(self) -> str:
+        """
+        获取 access_token。
+        """
+        entry = self.cacher[self.key]
+        if entry is None:
+            return self.refresh()
+        if self._due(entry) and self._claim():
+            Thread(target=self._background, daemon=True, name='wechat-access-token').start()
+        return entry['token']
+
+    def refresh(self, stale: str | None = None) -> str:
+        """
+        刷新 access_token。
+
+        :param stale: 已知失效的令牌。如果缓存中的令牌不是它，说明其它 worker 已经刷新过了，直接返回缓存中的令牌。
+        :return: 新的令牌。
+        """
+        with self.cacher.lock(self.key, timeout=30, wait=10) as locked:
+            entry = self.cacher[self.key]
+            # 等到锁时，其它 worker 可能已经刷新过了；等不到锁时，只能先用缓存中的令牌。
+            if entry is not None and entry['token'] != stale and (not locked or not self._due(entry)):
+                return entry['token']
+            return self._store(self.request.getAccessToken(self.appid, self.secret))
+
+    def invalidate(self) -> None:
+        """
+        删除缓存的 access_token。
+        """
+        del self.cacher[self.key]
+
+    async def aget(self) -> str:
+        """
+        :meth:`get` 的异步版本，后台刷新在当前事件循环中进行。
+        """
+        entry = await self.cacher.aget(self.key)
+        if entry is None:
+            return await self.arefresh()
+        if self._due(entry) and self._claim():
+            task = ensure_future(self._abackground())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return entry['token']
+
+    async def arefresh(self, stale: str | None = None) -> str:
+        """
+        :meth:`refresh` 的异步版本。
+        """
+        async with self.cacher.lock(self.key, timeout=30, wait=10) as locked:
+            entry = await self.cacher.aget(self.key)
+            # 等到锁时，其它 worker 可能已经刷新过了；等不到锁时，只能先用缓存中的令牌。
+            if entry is not None and entry['token'] != stale and (not locked or not self._due(entry)):
+                return entry['token']
+            return await self._astore(await self.request.agetAccessToken(self.appid, self.secret))
+
+    async def ainvalidate(self) -> None:
+        """
+        :meth:`invalidate` 的异步版本。
+        """
+        await self.cacher.adelete(self.key)
+
+    def _due(self, entry: dict) -> bool:
+        return entry['expires_at'] - time() < self.ahead
+
+    def _claim(self) -> bool:
+        # 每个进程同一时间只发起一次后台刷新。
+        lock = self._refreshing.setdefault(self.key, Lock())
+        return lock.acquire(blocking=False)
+
+    def _background(self) -> None:
+        try:
+            self._refresh_if_unlocked()
+        except Exception as e:
+            logger.exception('微信API：后台刷新 access_token 失败', exc_info=e)
+        finally:
+            self._refreshing[self.key].release()
+
+    def _refresh_if_unlocked(self) -> None:
+        lock = self.cacher.lock(self.key, timeout=30)
+        if not lock.acquire(blocking=False):
+            return
+        try:
+            self._store(self.request.getAccessToken(self.appid, self.secret))
+        finally:
+            lock.release()
+
+    async def _abackground(self) -> None:
+        lock = self.cacher.lock(self.key, timeout=30)
+        try:
+            if await lock.aacquire(blocking=False):
+                await self._astore(await self.request.agetAccessToken(self.appid, self.secret))
+        except Exception as e:
+            logger.exception('微信API：后台刷新 access_token 失败', exc_info=e)
+        finally:
+            await lock.arelease()
+            self._refreshing[self.key].release()
+
+    def _entry(self, resp: 'AccessTokenResponse | WeChatResponse') -> tuple[dict, int]:
+        expires_in = int(resp.expires_in or 7200)
+        entry = {'token': resp.access_token, 'expires_at': time() + expires_in}
+        return entry, max(expires_in - self.margin, 1)
+
+    def _store(self, resp: 'AccessTokenResponse | WeChatResponse') -> str:
+        entry, timeout = self._entry(resp)
+        self.cacher[self.key, timeout] = entry
+        return entry['token']
+
+    async def _astore(self, resp: 'AccessTokenResponse | WeChatResponse') -> str:
+        entry, timeout = self._entry(resp)
+        await self.cacher.aset(self.key, entry, timeout)
+        return entry['token']
 
 
 class WeChatResponse:
@@ -162,3 +421,69 @@ class WeChatResponse:
             for attr in self.__dict__
             if attr not in self.STANDARD_FIELDS and not attr.startswith('__')
         }
+
+
+class TypedWeChatResponse:
+    """
+    已知 API 成功响应的紧凑表示，与 :class:`WeChatResponse` 的用法相同，但字段固定、没有 ``__dict__`` 。
+
+    子类需要是 ``@dataclass(slots=True)`` ，并通过 :meth:`register` 登记到 API 路径上。
+    """
+
+    __slots__ = ()
+    __errcode__ = WeChatErrcode.SUCCEED.value
+    errcode = WeChatErrcode.SUCCEED
+    errmsg = ''
+
+    @classmethod
+    def register(cls, path: str):
+        """
+        把类型化响应登记到 :attr:`WeChatRequest.typed` 。
+        """
+
+        def decorator(klass: type[TypedWeChatResponse]) -> type[TypedWeChatResponse]:
+            WeChatRequest.typed[path] = klass
+            return klass
+
+        return decorator
+
+    @classmethod
+    def parse(cls, body: dict):
+        """
+        从响应体构造对象。响应带有错误码或缺少字段时返回 ``None`` ，由调用方退回到 :class:`WeChatResponse` 。
+        """
+        if body.get('errcode'):
+            return None
+        try:
+            return cls(**{name: body[name] for name in cls.__slots__ if name in body})
+        except TypeError:
+            return None
+
+    def fields(self, with_standard_fields=False) -> dict:
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        if with_standard_fields:
+            fields.update(errcode=self.errcode, errmsg=self.errmsg)
+        return fields
+
+
+@TypedWeChatResponse.register('/sns/jscode2session')
+@dataclass(slots=True)
+class Code2SessionResponse(TypedWeChatResponse):
+    """
+    :meth:`WeChatRequest.code2session` 的成功响应。
+    """
+
+    openid: str
+    session_key: str = field(repr=False)
+    unionid: str | None = None
+
+
+@TypedWeChatResponse.register('/cgi-bin/token')
+@dataclass(slots=True)
+class AccessTokenResponse(TypedWeChatResponse):
+    """
+    :meth:`WeChatRequest.getAccessToken` 的成功响应。
+    """
+
+    access_token: str = field(repr=False)
+    expires_in: int = 7200
@@ -1,4 +1,4 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
 
 
 class CoreConfig(AppConfig):
@@ -7,3 +7,16 @@ class CoreConfig(AppConfig):
     verbose_name = 'Project Core'
     # TODO: 创建新的 Django App 前请平衡数据库行宽与数据增量，选择 AutoField 或 BigAutoField。
     default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        from apps.core import signals  # noqa: F401
+        from commons.pagination import count_models
+
+        # 在启动时登记项目定义的模型（包括多对多的中间模型），不依赖当前进程是否分页过。
+        count_models(
+            *(
+                model
+                for model in apps.get_models(include_auto_created=True)
+                if model._meta.app_config.name.startswith('apps.')
+            )
+        )
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.models import User, WechatUser
+from utils.cache import cacher, model_tag
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user(sender, instance: User, raw: bool = False, **kwargs):
+    """
+    用户变更后，让从它派生的缓存失效。
+    """
+    if raw:
+        return
+    cacher.invalidate_tags(model_tag(User), model_tag(instance))
+
+
+@receiver([post_save, post_delete], sender=WechatUser)
+def invalidate_wechat_user(sender, instance: WechatUser, raw: bool = False, **kwargs):
+    """
+    微信用户变更后，让从它以及所属用户派生的缓存失效。
+    """
+    if raw:
+        return
+    cacher.invalidate_tags(model_tag(WechatUser), model_tag(instance), f'{model_tag(User)}:{instance.user_id}')
@@ -1,3 +1,1166 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import logging
+from contextlib import contextmanager, suppress
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from http import HTTPMethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Barrier, Lock, Thread
+from time import monotonic, sleep
+from types import MappingProxyType
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+from uuid import UUID
 
-# Create your tests here.
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.db import connections
+from django.db.models.signals import m2m_changed
+from django.http import QueryDict
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.wechat import (
+    AccessTokenResponse,
+    Code2SessionResponse,
+    WeChatAccessToken,
+    WeChatErrcode,
+    WeChatRequest,
+    WeChatResponse,
+)
+from apps.core.models import User, WechatUser
+from apps.core.views import CacheStatsView
+from commons.exceptions import MeowViewException
+from commons.pagination import MeowCursorPagination, MeowPageNumberPagination, _counted, count
+from commons.renderers import MeowJSONRenderer
+from commons.response import Errcode, resp200
+from commons.views import MeowAPIView
+from utils.cache import _MISSING, CacheLock, CacheMetrics, Cacher, Codec, NearCache, cached, cacher, model_tag
+from utils.request import CircuitBreaker, RateLimiter, RetryPolicy, ServiceRequest, afanout, fanout
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+class Upstream:
+    """
+    在后台线程中运行的模拟上游服务，记录收到的请求。
+    """
+
+    def __init__(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                upstream.reply(self)
+
+            do_POST = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.lock = Lock()
+        self.reset()
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self):
+        self.status = 200
+        self.delay = 0.0
+        self.body = b'{}'
+        self.headers = {'Content-Type': 'application/json'}
+        self.paths = []
+        self.ports = set()
+
+    @property
+    def hits(self) -> int:
+        return len(self.paths)
+
+    def reply(self, handler: BaseHTTPRequestHandler):
+        handler.rfile.read(int(handler.headers.get('Content-Length') or 0))
+        with self.lock:
+            self.paths.append(handler.path)
+            self.ports.add(handler.client_address[1])
+        sleep(self.delay)
+        body = self.body(handler.path) if callable(self.body) else self.body
+        handler.send_response(self.status)
+        for name, value in self.headers.items():
+            handler.send_header(name, value)
+        if handler.close_connection:
+            handler.send_header('Connection', 'close')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        # 客户端取消请求时已经断开连接。
+        with suppress(ConnectionError):
+            handler.wfile.write(body)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class UpstreamTestCase(SimpleTestCase):
+    """
+    向模拟上游服务发出请求的测试。每个测试通过 :meth:`service` 得到一个新的服务类，不共用连接池与熔断器。
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.upstream = Upstream()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.upstream.close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.upstream.reset()
+        clear_caches()
+
+    def service(self, **attrs) -> type[WeChatRequest]:
+        attrs = {'endpoint': self.upstream.url, 'retry': None, 'breaker': None, 'log_rate': 0, **attrs}
+        return type('Service', (WeChatRequest,), attrs)
+
+
+class CoalesceTests(UpstreamTestCase):
+    callers = 8
+
+    def test_one_breaker_outcome_per_upstream_call(self):
+        service = self.service(coalesce=True, breaker=CircuitBreaker(5, 30))
+        self.upstream.status, self.upstream.delay = 503, 0.3
+        barrier, errors = Barrier(self.callers), []
+
+        def call():
+            barrier.wait()
+            try:
+                service('GET', '/x').send()
+            except MeowViewException as e:
+                errors.append(e)
+
+        threads = [Thread(target=call) for _ in range(self.callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.upstream.hits, 1)
+        self.assertEqual(len(errors), self.callers)
+        self.assertEqual(service.breaker.failures, 1)
+        self.assertEqual(service.breaker.state, 'closed')
+
+    async def test_one_breaker_outcome_per_upstream_call_async(self):
+        service = self.service(coalesce=True, breaker=CircuitBreaker(5, 30))
+        self.upstream.status, self.upstream.delay = 503, 0.3
+        results = await asyncio.gather(
+            *(service('GET', '/x').asend() for _ in range(self.callers)), return_exceptions=True
+        )
+        self.assertEqual(self.upstream.hits, 1)
+        self.assertTrue(all(isinstance(result, MeowViewException) for result in results))
+        self.assertEqual(service.breaker.failures, 1)
+
+    async def test_cancelled_leader_hands_over(self):
+        service = self.service(coalesce=True)
+        self.upstream.delay = 0.2
+        self.upstream.body = lambda path: f'{{"path": "{path}"}}'.encode()
+        leader = asyncio.ensure_future(service('GET', '/x').asend())
+        await asyncio.sleep(0.05)
+        followers = asyncio.gather(*(service('GET', '/x').asend() for _ in range(3)))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        results = await followers
+        self.assertTrue(leader.cancelled())
+        self.assertEqual([result.path for result in results], ['/x'] * 3)
+        self.assertEqual(self.upstream.hits, 2)
+
+    def test_shared_across_processes_without_secrets(self):
+        service = self.service(coalesce=True, coalesce_ttl=60)
+        self.upstream.body = b'{"value": 1}'
+        request = service('GET', '/x', params={'a': '1'})
+        self.assertEqual(request.send().value, 1)
+        status, headers, content = cacher[request._coalesce_key()]
+        self.assertEqual((status, headers['Content-Type'], content), (200, 'application/json', b'{"value": 1}'))
+        self.assertEqual(service('GET', '/x', params={'a': '1'}).send().value, 1)
+        self.assertEqual(self.upstream.hits, 1)
+
+        request = service('GET', '/x', params={'secret': 's'})
+        request.send()
+        self.assertIsNone(cacher[request._coalesce_key()])
+
+
+class AsyncClientTests(UpstreamTestCase):
+    async def test_client_only_options_rejected(self):
+        service = self.service()
+        with self.assertRaisesMessage(TypeError, 'cert, verify'):
+            await service('GET', '/x', verify=False, cert='client.pem').asend()
+        self.assertEqual(self.upstream.hits, 0)
+
+    async def test_aclose(self):
+        service = self.service()
+        await service('GET', '/x').asend()
+        client = service.client()
+        await WeChatRequest.aclose()
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(service.client(), client)
+        await service('GET', '/x').asend()
+        self.assertEqual(self.upstream.hits, 2)
+        await service.aclose()
+
+
+class TypedResponseTests(UpstreamTestCase):
+    def test_code2session(self):
+        self.upstream.body = b'{"openid": "o", "session_key": "k"}'
+        resp = self.service().code2session('code')
+        self.assertIsInstance(resp, Code2SessionResponse)
+        self.assertFalse(hasattr(resp, '__dict__'))
+        self.assertEqual((resp.errcode, resp.openid, resp.session_key, resp.unionid), (0, 'o', 'k', None))
+        self.assertEqual(
+            resp.fields(True), {'openid': 'o', 'session_key': 'k', 'unionid': None, 'errcode': 0, 'errmsg': ''}
+        )
+        self.assertNotIn('k', repr(resp).replace('session', ''))
+
+    def test_access_token(self):
+        self.upstream.body = b'{"access_token": "t", "expires_in": 60}'
+        resp = self.service().getAccessToken('app', 'secret')
+        self.assertIsInstance(resp, AccessTokenResponse)
+        self.assertEqual((resp.access_token, resp.expires_in), ('t', 60))
+
+    def test_fallback(self):
+        service = self.service()
+        self.upstream.body = b'{"errcode": 40029, "errmsg": "invalid code"}'
+        resp = service('GET', '/sns/jscode2session').send()
+        self.assertIsInstance(resp, WeChatResponse)
+        self.assertEqual(
+            (resp.errcode, resp.__errcode__, resp.errmsg), (WeChatErrcode.INVALID_CODE, 40029, 'invalid code')
+        )
+        self.upstream.body = b'{"errcode": -1, "errmsg": "system busy"}'
+        with self.assertRaises(MeowViewException):
+            service.code2session('code')
+        self.upstream.body = b'{"session_key": "k"}'
+        self.assertIsInstance(service('GET', '/sns/jscode2session').send(), WeChatResponse)
+        self.upstream.body = b'{"openid": "o"}'
+        self.assertEqual(service('GET', '/other').send().openid, 'o')
+
+    def test_malformed(self):
+        self.upstream.body = b'<html>'
+        with self.assertRaises(MeowViewException) as raised:
+            self.service()('GET', '/sns/jscode2session').send()
+        self.assertIn('exc', raised.exception.fields)
+
+
+class LoggingTests(UpstreamTestCase):
+    logger = 'project.api.wechat'
+
+    def setUp(self):
+        super().setUp()
+        self.upstream.body = b'{"openid": "o", "session_key": "k3y"}'
+
+    def request(self, service: type[WeChatRequest]) -> WeChatRequest:
+        return service('GET', '/x', params={'a': '1', 'secret': 's3cr3t'}, headers={'Authorization': 'Bearer t0k3n'})
+
+    def assertRedacted(self, records: list):
+        for record in records:
+            text = f'{record.getMessage()} {vars(record)}'
+            for secret in ('s3cr3t', 't0k3n', 'k3y'):
+                self.assertNotIn(secret, text)
+
+    def test_redacted(self):
+        with self.assertLogs(self.logger, 'INFO') as logs:
+            self.request(self.service(log_rate=1)).send()
+        request, response = logs.records
+        self.assertEqual(request.request['url'], f'{self.upstream.url}/x?a=1&secret=***')
+        self.assertEqual(request.request['headers']['Authorization'], '***')
+        self.assertEqual((response.response['status'], response.response['size']), (200, len(self.upstream.body)))
+        self.assertRedacted(logs.records)
+
+    def test_truncated(self):
+        with self.assertLogs(self.logger, 'INFO') as logs:
+            self.request(self.service(log_rate=1, log_limit=10)).send()
+        self.assertEqual(len(logs.records[1].response['body']), 10)
+
+    def test_sampled(self):
+        service = self.service(log_rate=0.5)
+        with patch('utils.request.random', side_effect=[0.9, 0.1]), self.assertLogs(self.logger, 'INFO') as logs:
+            self.request(service).send()
+            self.request(service).send()
+        # 每个请求只抽样一次，请求与响应的日志成对出现。
+        self.assertEqual(len(logs.records), 2)
+        with self.assertNoLogs(self.logger, 'INFO'):
+            self.request(self.service(log_rate=0)).send()
+
+    def test_lazy(self):
+        request = self.request(self.service(log_rate=1))
+        with (
+            patch.object(logging.getLogger(self.logger), 'isEnabledFor', return_value=False),
+            patch.object(request, '_redacted_url', side_effect=AssertionError),
+        ):
+            request.send()
+
+    def test_error_without_secrets_or_cause(self):
+        service = self.service(endpoint='http://127.0.0.1:1', log_rate=0)
+        with self.assertLogs(self.logger, 'ERROR') as logs, self.assertRaises(MeowViewException) as raised:
+            self.request(service).send()
+        (record,) = logs.records
+        self.assertIsNone(record.exc_info)
+        self.assertIn('?***', record.request['message'])
+        self.assertRedacted(logs.records)
+        self.assertIsNone(raised.exception.__cause__)
+        self.assertTrue(raised.exception.__suppress_context__)
+
+
+class RequestTemplateTests(UpstreamTestCase):
+    def test_params(self):
+        service = self.service()
+        cases = [
+            (None, ''),
+            ({'a': 1, 'b': ['x', 'y'], 'c': ('z',)}, '?a=1&b=x&b=y&c=z'),
+            ('a=1&b=x&b=y', '?a=1&b=x&b=y'),
+            (QueryDict('a=1&b=x'), '?a=1&b=x'),
+        ]
+        for params, query in cases:
+            with self.subTest(params=params):
+                request = service('GET', '/x', params=params)
+                self.assertEqual(request.url, f'{self.upstream.url}/x{query}')
+                self.assertEqual(request.url, request.url)
+        with self.assertRaises(ValueError):
+            service('GET', '/x', params=[('a', 1)])
+
+    def test_query_changes_url(self):
+        service = self.service()
+        request = service('GET', '/x', params={'a': 1})
+        self.assertEqual(request.url, f'{self.upstream.url}/x?a=1')
+        request.query['b'] = '2'
+        self.assertEqual(request.url, f'{self.upstream.url}/x?a=1&b=2')
+        request.query = {'c': 3}
+        self.assertEqual(request.url, f'{self.upstream.url}/x?c=3')
+        request.send()
+        self.assertEqual(self.upstream.paths, ['/x?c=3'])
+
+    def test_template_cached(self):
+        # 模板按 endpoint 缓存在 ServiceRequest 上，不同测试的服务类共用同一个 endpoint 。
+        service = self.service()
+        self.assertEqual(service(HTTPMethod.POST, '/template').method, 'POST')
+        with patch.object(service, '_template', wraps=service._template) as template:
+            service('GET', '/template')
+            service('GET', '/template')
+            service(HTTPMethod.POST, '/template')
+        self.assertEqual(template.call_count, 1)
+        with self.assertRaises(ValueError):
+            service('get', '/template')
+
+
+class StreamingTests(UpstreamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = [{'id': i, 'name': f'item{i}'} for i in range(2000)]
+        self.upstream.body = json.dumps(self.items).encode()
+
+    def gzipped(self):
+        self.upstream.headers['Content-Encoding'] = 'gzip'
+        self.upstream.body = gzip.compress(self.upstream.body)
+
+    def test_read_and_stream(self):
+        service = self.service()
+        self.assertEqual(json.loads(service('GET', '/x').read()), self.items)
+        chunks = list(service('GET', '/x').stream(chunk_size=1024))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), self.upstream.body)
+
+    def test_iter_json(self):
+        self.upstream.body = json.dumps({'data': self.items}).encode()
+        self.assertEqual(list(self.service()('GET', '/x').iter_json('data.item', chunk_size=1024)), self.items)
+
+    def test_max_body(self):
+        service = self.service(max_body=1024)
+        with self.assertRaises(MeowViewException) as raised:
+            service('GET', '/x').open()
+        self.assertEqual(raised.exception.errcode, Errcode.DEPENDENCE_ERROR)
+        self.upstream.status = 500
+        with self.assertRaises(MeowViewException) as raised:
+            self.service()('GET', '/x').open()
+        self.assertEqual(raised.exception.fields['http'], 500)
+
+    def test_streaming_response(self):
+        response = self.service()('GET', '/x').streaming_response()
+        self.assertEqual(response['Content-Length'], str(len(self.upstream.body)))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(b''.join(response.streaming_content), self.upstream.body)
+
+    def test_gzip(self):
+        raw = self.upstream.body
+        self.gzipped()
+        response = self.service()('GET', '/x').streaming_response()
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(b''.join(response.streaming_content), raw)
+        # 压缩后的长度不超过 max_body，但解压后的响应体超过了。
+        service = self.service(max_body=len(self.upstream.body) + 1)
+        with self.assertRaises(MeowViewException):
+            service('GET', '/x').read()
+
+    async def test_async(self):
+        service = self.service()
+        self.assertEqual(json.loads(await service('GET', '/x').aread()), self.items)
+        self.assertEqual([item async for item in service('GET', '/x').aiter_json()], self.items)
+        response = await service('GET', '/x').astreaming_response()
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), self.upstream.body)
+        with self.assertRaises(MeowViewException):
+            await self.service(max_body=1024)('GET', '/x').aopen()
+
+    async def test_async_gzip(self):
+        raw = self.upstream.body
+        self.gzipped()
+        response = await self.service()('GET', '/x').astreaming_response()
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), raw)
+
+
+class AccessTokenTests(UpstreamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.issued, self.expires_in, self.revoked = 0, 7200, set()
+        self.upstream.body = self.reply
+        self.token = WeChatAccessToken('app', 'secret', request=self.service())
+
+    def reply(self, path: str) -> bytes:
+        url = urlsplit(path)
+        if url.path == '/cgi-bin/token':
+            self.issued += 1
+            return json.dumps({'access_token': f't{self.issued}', 'expires_in': self.expires_in}).encode()
+        token = parse_qs(url.query)['access_token'][0]
+        if token in self.revoked:
+            return b'{"errcode": 40001, "errmsg": "invalid credential"}'
+        return json.dumps({'errcode': 0, 'token': token}).encode()
+
+    def test_cached(self):
+        self.assertEqual(self.token.get(), 't1')
+        self.assertEqual(self.token.get(), 't1')
+        self.assertEqual(self.issued, 1)
+        self.assertEqual(WeChatAccessToken('app', request=self.service()).get(), 't1')
+
+    def test_refreshed_in_background(self):
+        self.expires_in = 400
+        self.assertEqual(self.token.get(), 't1')
+        self.assertEqual(self.token.get(), 't1')
+        deadline = monotonic() + 2
+        while self.token.cacher[self.token.key]['token'] != 't2' and monotonic() < deadline:
+            sleep(0.01)
+        self.assertEqual(self.token.get(), 't2')
+
+    def test_refresh_after_other_worker(self):
+        self.token.get()
+        self.assertEqual(self.token.refresh('t0'), 't1')
+        self.assertEqual(self.token.refresh('t1'), 't2')
+        self.assertEqual(self.issued, 2)
+        self.token.invalidate()
+        self.assertEqual(self.token.get(), 't3')
+
+    def test_invalid_token_refreshed(self):
+        self.token.get()
+        self.revoked.add('t1')
+        self.assertEqual(self.token.request.authorized('GET', '/api', token=self.token).token, 't2')
+        self.assertEqual(self.token.get(), 't2')
+
+    async def test_async(self):
+        self.assertEqual(await self.token.aget(), 't1')
+        self.revoked.add('t1')
+        resp = await self.token.request.aauthorized('GET', '/api', token=self.token)
+        self.assertEqual(resp.token, 't2')
+        await self.token.ainvalidate()
+        self.assertEqual(await self.token.aget(), 't3')
+
+    async def test_async_refreshed_in_background(self):
+        self.expires_in = 400
+        self.assertEqual(await self.token.aget(), 't1')
+        self.assertEqual(await self.token.aget(), 't1')
+        await asyncio.gather(*WeChatAccessToken._tasks)
+        self.assertEqual(await self.token.aget(), 't2')
+
+
+class FanoutTests(UpstreamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.upstream.delay = 0.2
+        self.upstream.body = lambda path: f'{{"path": "{path}"}}'.encode()
+
+    def batch(self, service: type[WeChatRequest]) -> list:
+        unreachable = self.service(endpoint='http://127.0.0.1:1')
+        return [*(service('GET', f'/{i}') for i in range(4)), unreachable('GET', '/x')]
+
+    def assertResults(self, results: list):
+        self.assertEqual([result.path for result in results[:4]], ['/0', '/1', '/2', '/3'])
+        self.assertIsInstance(results[4], MeowViewException)
+
+    def test_concurrent(self):
+        start = monotonic()
+        results = fanout(self.batch(self.service()))
+        self.assertLess(monotonic() - start, 0.6)
+        self.assertResults(results)
+
+    def test_concurrency_limited(self):
+        start = monotonic()
+        results = fanout(self.batch(self.service(concurrency=2)))
+        self.assertGreaterEqual(monotonic() - start, 0.4)
+        self.assertResults(results)
+
+    def test_timeout(self):
+        results = fanout([self.service()('GET', '/x')], timeout=0.05)
+        self.assertEqual(results[0].errcode, Errcode.DEPENDENCE_TIMEOUT)
+        self.assertEqual(fanout([]), [])
+
+    async def test_async(self):
+        start = monotonic()
+        results = await afanout(self.batch(self.service()))
+        self.assertLess(monotonic() - start, 0.6)
+        self.assertResults(results)
+
+    async def test_async_concurrency_limited(self):
+        start = monotonic()
+        results = await afanout(self.batch(self.service(concurrency=2)))
+        self.assertGreaterEqual(monotonic() - start, 0.4)
+        self.assertResults(results)
+
+    async def test_async_timeout(self):
+        results = await afanout([self.service()('GET', '/x')], timeout=0.05)
+        self.assertEqual(results[0].errcode, Errcode.DEPENDENCE_TIMEOUT)
+        self.assertEqual(await afanout([]), [])
+
+
+class RendererTests(SimpleTestCase):
+    def test_same_as_json_renderer(self):
+        data = {
+            'datetime': datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+            'naive': datetime(2026, 1, 2, 3, 4, 5),
+            'date': date(2026, 1, 2),
+            'time': time(3, 4, 5),
+            'decimal': Decimal('1.50'),
+            'uuid': UUID(int=1),
+            'lazy': gettext_lazy('完成'),
+            'nested': [{'key': 1}],
+        }
+        rendered = MeowJSONRenderer().render(data)
+        self.assertEqual(rendered, JSONRenderer().render(data))
+        self.assertIn(b'"2026-01-02T03:04:05.678901Z"', rendered)
+
+
+class ResponseTests(SimpleTestCase):
+    def test_validated_under_test_runner(self):
+        self.assertTrue(settings.RESPONSE_VALIDATION)
+        with self.assertRaisesMessage(AssertionError, '"pages" 字段必须是 int 类型'):
+            resp200([], pages='9')
+        with self.assertRaisesMessage(AssertionError, '不能接受名为 message 的额外参数'):
+            Errcode.INVALID_PARAMS(message='x')
+
+
+class SessionTests(UpstreamTestCase):
+    def test_connection_reused(self):
+        service = self.service()
+        for _ in range(3):
+            service('GET', '/x').send()
+        self.assertEqual((self.upstream.hits, len(self.upstream.ports)), (3, 1))
+
+    def test_keep_alive_disabled(self):
+        service = self.service(keep_alive=False)
+        for _ in range(3):
+            service('GET', '/x').send()
+        self.assertEqual(len(self.upstream.ports), 3)
+
+    def test_per_class_and_process(self):
+        service, other = self.service(), self.service()
+        self.assertIs(service.session(), service.session())
+        self.assertIsNot(service.session(), other.session())
+        session = service.session()
+        with patch('utils.request.getpid', return_value=-1):
+            forked = service.session()
+            self.assertIs(forked, service.session())
+        self.assertIsNot(forked, session)
+        self.assertIs(service.session(), session)
+
+    def test_pool_options(self):
+        adapter = self.service(pool_maxsize=3, retries=2).session().get_adapter(self.upstream.url)
+        self.assertEqual((adapter._pool_maxsize, adapter.max_retries.connect, adapter.max_retries.read), (3, 2, 0))
+
+
+class RetryTests(UpstreamTestCase):
+    def service(self, **attrs) -> type[WeChatRequest]:
+        return super().service(retry=RetryPolicy(3, backoff=0, errcodes=(WeChatErrcode.FAILED,)), **attrs)
+
+    def test_idempotent_retried(self):
+        self.upstream.status = 503
+        with self.assertRaises(MeowViewException):
+            self.service()('GET', '/x').send()
+        self.assertEqual(self.upstream.hits, 3)
+
+    def test_errcode_retried(self):
+        self.upstream.body = b'{"errcode": -1, "errmsg": "system error"}'
+        self.service()('POST', '/x').send()
+        self.assertEqual(self.upstream.hits, 3)
+
+    def test_code2session_not_retried(self):
+        service = self.service()
+        for status, body in ((503, b'{}'), (200, b'{"errcode": -1, "errmsg": "system error"}')):
+            with self.subTest(status=status):
+                self.upstream.reset()
+                self.upstream.status, self.upstream.body = status, body
+                with self.assertRaises(MeowViewException):
+                    service.code2session('code', appid='appid', secret='secret')
+                self.assertEqual(self.upstream.hits, 1)
+
+    def test_only_connect_errors_retried(self):
+        policy = WeChatRequest.retry_policies['/sns/jscode2session']
+        self.upstream.delay = 0.2
+        errors = []
+        for url, timeout in (('http://127.0.0.1:1', 1), (self.upstream.url, 0.05)):
+            try:
+                requests.get(url, timeout=timeout)
+            except requests.RequestException as e:
+                errors.append(e)
+        refused, timed_out = errors
+        self.assertTrue(policy.on_error('GET', refused))
+        self.assertFalse(policy.on_error('GET', timed_out))
+        self.assertTrue(WeChatRequest.retry.on_error('GET', timed_out))
+
+    def test_session_does_not_retry_reads(self):
+        retry = self.service(retries=2).session().get_adapter(self.upstream.url).max_retries
+        self.assertEqual((retry.connect, retry.read, retry.status), (2, 0, 0))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_states(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+        self.assertFalse(breaker.check())
+        breaker.fail()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.fail()
+        self.assertEqual(breaker.state, 'open')
+        with self.assertRaises(MeowViewException):
+            breaker.check()
+
+        sleep(0.05)
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertTrue(breaker.check())
+        # 同一时刻只放行一个探测请求。
+        with self.assertRaises(MeowViewException):
+            breaker.check()
+        breaker.fail()
+        self.assertEqual(breaker.state, 'open')
+
+        sleep(0.05)
+        self.assertTrue(breaker.check())
+        breaker.abandon()
+        self.assertTrue(breaker.check())
+        breaker.succeed()
+        self.assertEqual((breaker.state, breaker.failures), ('closed', 0))
+        self.assertFalse(breaker.check())
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=30)
+        breaker.fail()
+        breaker.succeed()
+        breaker.fail()
+        self.assertEqual(breaker.state, 'closed')
+
+
+class ServiceLimiterTests(UpstreamTestCase):
+    def test_endpoint_and_path(self):
+        service = self.service(limiter=RateLimiter('endpoint', 3, 60), limiters={'/x': RateLimiter('path', 1, 60)})
+        service('GET', '/x').send()
+        with self.assertRaises(MeowViewException) as raised:
+            service('GET', '/x').send()
+        self.assertEqual(raised.exception.errcode, Errcode.DEPENDENCE_UNAVAILABLE)
+        service('GET', '/y').send()
+        with self.assertRaises(MeowViewException):
+            service('GET', '/y').send()
+        self.assertEqual(self.upstream.paths, ['/x', '/y'])
+
+    async def test_async(self):
+        service = self.service(limiters={'/x': RateLimiter('path', 1, 60)})
+        await service('GET', '/x').asend()
+        with self.assertRaises(MeowViewException):
+            await service('GET', '/x').asend()
+        self.assertEqual(self.upstream.hits, 1)
+
+    def test_default_read_only(self):
+        self.assertIsInstance(ServiceRequest.limiters, MappingProxyType)
+        with self.assertRaises(TypeError):
+            WeChatRequest.limiters['/x'] = RateLimiter('path', 1, 60)
+
+
+class RateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_rejects_over_rate(self):
+        limiter = RateLimiter('test', 2, 60)
+        limiter.acquire()
+        limiter.acquire()
+        with self.assertRaises(MeowViewException):
+            limiter.acquire()
+        # 被拒绝的请求不占用配额。
+        RateLimiter('test', 3, 60).acquire()
+
+    def test_waits_for_window(self):
+        limiter = RateLimiter('test', 2, 0.2, wait=1)
+        start = monotonic()
+        for _ in range(3):
+            limiter.acquire()
+        self.assertGreater(monotonic() - start, 0.05)
+
+    async def test_async(self):
+        limiter = RateLimiter('test', 2, 60)
+        await limiter.aacquire()
+        await limiter.aacquire()
+        with self.assertRaises(MeowViewException):
+            await limiter.aacquire()
+
+
+class CacherBatchTests(SimpleTestCase):
+    def setUp(self):
+        clear_caches()
+        self.cacher = Cacher().namespace('batch')
+
+    def test_round_trips(self):
+        target = self.cacher.target
+        with patch.object(target, 'set_many', wraps=target.set_many) as set_many:
+            self.assertEqual(self.cacher.set_many({'a': 1, 'b': 2}, 60), [])
+        set_many.assert_called_once()
+        with patch.object(target, 'get_many', wraps=target.get_many) as get_many:
+            self.assertEqual(self.cacher.get_many(['b', 'a', 'c'], default=0), {'b': 2, 'a': 1, 'c': 0})
+        # 一次读取缓存值，一次读取命名空间的版本号。
+        self.assertEqual(get_many.call_count, 2)
+        with patch.object(target, 'delete_many', wraps=target.delete_many) as delete_many:
+            self.cacher.delete_many(['a', 'b'])
+        delete_many.assert_called_once()
+        self.assertEqual(self.cacher[['a', 'b']], {'a': None, 'b': None})
+
+    def test_item_syntax(self):
+        self.cacher[['a', 'b'], 60] = [1, 2]
+        self.assertEqual(self.cacher[['a', 'b', 'c'], 0], {'a': 1, 'b': 2, 'c': 0})
+        del self.cacher[['a']]
+        self.assertEqual(self.cacher['a', 0], 0)
+        with self.assertRaises(ValueError):
+            self.cacher[['a', 'b'], 60] = [1]
+        with self.assertRaises(TypeError):
+            self.cacher[['a', 'b'], 60] = 'ab'
+
+
+class AsyncCacherTests(SimpleTestCase):
+    def setUp(self):
+        clear_caches()
+        self.cacher = Cacher().namespace('async')
+
+    async def test_methods(self):
+        await self.cacher.aset('a', 1, 60)
+        self.assertEqual(await self.cacher.aset_many({'b': 2, 'c': 3}, 60), [])
+        self.assertTrue(await self.cacher.acontains('a'))
+        self.assertEqual(await self.cacher.aget_many(['a', 'b', 'x'], default=0), {'a': 1, 'b': 2, 'x': 0})
+        await self.cacher.adelete('a')
+        await self.cacher.adelete_many(['b'])
+        self.assertEqual(await self.cacher.aget('a', 0), 0)
+        self.assertEqual(await self.cacher.aget('b', 0), 0)
+        await self.cacher.ainvalidate()
+        self.assertEqual(await self.cacher.aget('c', 0), 0)
+
+    async def test_single_flight(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return 'value'
+
+        results = await asyncio.gather(*(self.cacher.aget_or_set('key', compute, 60) for _ in range(5)))
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.cacher['key'], 'value')
+
+
+class TagTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.cacher = Cacher()
+
+    def test_invalidate_tags(self):
+        self.cacher.set('a', 1, 60, tags=['x'])
+        self.cacher.set_many({'b': 2, 'c': 3}, 60, tags=['x', 'y'])
+        self.cacher['d', 60] = 4
+        self.cacher.invalidate_tags('y')
+        self.assertEqual(self.cacher[['a', 'b', 'c', 'd']], {'a': 1, 'b': None, 'c': None, 'd': 4})
+        self.cacher.invalidate_tags('x')
+        self.assertIsNone(self.cacher['a'])
+
+    def test_namespace(self):
+        outer = self.cacher.namespace('outer')
+        inner = outer.namespace('inner')
+        outer['a', 60] = 1
+        inner['a', 60] = 2
+        self.assertEqual(self.cacher['outer:inner:a'], 2)
+        inner.invalidate()
+        self.assertEqual((outer['a'], inner['a']), (1, None))
+        inner['a', 60] = 2
+        outer.invalidate()
+        self.assertEqual((outer['a'], inner['a']), (None, None))
+        with self.assertRaises(AssertionError):
+            self.cacher.invalidate()
+
+    def test_invalidated_by_model_signals(self):
+        user = User.objects.create(username='tagged')
+        wechat = WechatUser.objects.create(user=user, openid='tagged')
+        self.cacher.set('user', 1, 60, tags=[model_tag(user)])
+        self.cacher.set('wechat', 1, 60, tags=[model_tag(wechat)])
+        wechat.save()
+        self.assertEqual((self.cacher['user'], self.cacher['wechat']), (None, None))
+        self.cacher.set('user', 1, 60, tags=[model_tag(user)])
+        self.cacher.set('users', 1, 60, tags=[model_tag(User)])
+        user.delete()
+        self.assertEqual((self.cacher['user'], self.cacher['users']), (None, None))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.cacher = Cacher(metrics=CacheMetrics(sample_rate=1))
+
+    def test_snapshot(self):
+        self.cacher['user:1', 60] = 'x' * 100
+        self.cacher['user:1']
+        self.cacher['user:2']
+        del self.cacher['user:1']
+        snapshot = self.cacher.stats['metrics']
+        user = snapshot['prefixes']['user']
+        self.assertEqual(
+            {k: user[k] for k in ('hits', 'misses', 'sets', 'deletes', 'hit_ratio')},
+            {'hits': 1, 'misses': 1, 'sets': 1, 'deletes': 1, 'hit_ratio': 0.5},
+        )
+        self.assertGreater(user['avg_bytes'], 100)
+        self.assertEqual(snapshot['latency']['get']['count'], 2)
+        self.assertEqual(sum(snapshot['latency']['get']['buckets'].values()), 2)
+        self.cacher.metrics.reset()
+        self.assertEqual(self.cacher.stats['metrics'], {'prefixes': {}, 'latency': {}})
+
+    def test_disabled(self):
+        self.assertEqual(Cacher().stats, {'metrics': None, 'near': None, 'codec': None})
+
+    def test_admin_only(self):
+        view = CacheStatsView.as_view()
+        request = APIRequestFactory().get('/metrics/cache')
+        force_authenticate(request, User(username='metrics'))
+        self.assertEqual(view(request).data['errcode'], Errcode.FAILED)
+        force_authenticate(request, User(username='metrics', is_staff=True))
+        response = view(request)
+        self.assertEqual(response.data['errcode'], Errcode.DONE)
+        self.assertEqual(response.data['data'], cacher.stats)
+
+
+class CachedTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.calls = []
+
+        @cached(60, exclude=('request',))
+        def stats(request, user: User, days: int = 7) -> tuple:
+            self.calls.append((user.pk, days))
+            return user.username, days
+
+        self.stats = stats
+
+    def test_keyed_by_arguments(self):
+        user = User.objects.create(username='cached')
+        self.assertEqual(self.stats('a', user), ('cached', 7))
+        self.assertEqual(self.stats('b', user=user, days=7), ('cached', 7))
+        self.assertEqual(self.stats(None, user, 30), ('cached', 30))
+        self.assertEqual(self.calls, [(user.pk, 7), (user.pk, 30)])
+        self.assertEqual(self.stats.key('a', user), self.stats.key(None, user, days=7))
+
+    def test_invalidate(self):
+        user = User.objects.create(username='cached')
+        self.stats(None, user)
+        self.stats(None, user, 30)
+        self.stats.invalidate(None, user)
+        self.stats(None, user)
+        self.stats(None, user, 30)
+        self.assertEqual(len(self.calls), 3)
+        self.stats.invalidate_all()
+        self.stats(None, user, 30)
+        self.assertEqual(len(self.calls), 4)
+
+    def test_invalidated_with_model(self):
+        user = User.objects.create(username='cached')
+        self.stats(None, user)
+        user.username = 'renamed'
+        user.save()
+        self.assertEqual(self.stats(None, user), ('renamed', 7))
+
+    def test_unsupported_argument(self):
+        with self.assertRaises(TypeError):
+            self.stats(None, object())
+
+
+class CodecTests(SimpleTestCase):
+    def setUp(self):
+        clear_caches()
+        self.value = {'name': 'codec', 'items': [{'id': i % 10, 'tag': 'cache'} for i in range(200)]}
+
+    def test_round_trips(self):
+        for name in ('pickle', 'json', 'orjson', 'msgpack'):
+            for compress in (None, 'zlib', 'lz4'):
+                with self.subTest(name=name, compress=compress):
+                    codec = Codec(name, compress)
+                    self.assertEqual(Codec.unpack(codec.pack(self.value)), self.value)
+                    self.assertEqual(codec.stats['compressed'], int(compress is not None))
+
+    def test_threshold(self):
+        codec = Codec('json', 'zlib', threshold=4096)
+        codec.pack(['x' * 4091])  # 序列化后是 4095 字节
+        codec.pack(['x' * 4092])
+        self.assertEqual(codec.stats['packed'], 2)
+        self.assertEqual(codec.stats['compressed'], 1)
+        self.assertGreater(codec.stats['saved_bytes'], 0)
+        self.assertEqual(codec.stats['saved_bytes'], codec.stats['raw_bytes'] - codec.stats['stored_bytes'])
+
+    def test_incompressible_kept_raw(self):
+        codec = Codec('pickle', 'zlib', threshold=0)
+        self.assertEqual(codec.pack(b'\x00')[1], 0)
+        self.assertEqual(codec.stats['compressed'], 0)
+
+    def test_readable_after_switch(self):
+        Cacher(codec=Codec('msgpack', 'lz4', threshold=0))['key', 60] = self.value
+        self.assertEqual(Cacher(codec=Codec('json'))['key'], self.value)
+        self.assertEqual(Cacher()['key'], self.value)
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            Codec('yaml')
+        with self.assertRaises(ValueError):
+            Codec(compress='brotli')
+
+
+class NearCacheTests(SimpleTestCase):
+    def setUp(self):
+        clear_caches()
+        self.cacher = Cacher(near=NearCache(''))
+
+    def test_hit(self):
+        self.cacher['key', 60] = 'value'
+        self.assertEqual(self.cacher['key'], 'value')
+        self.assertEqual(self.cacher.near.stats, {'hits': 1, 'misses': 0, 'size': 1})
+
+    def test_mutation_not_shared(self):
+        self.cacher['key', 60] = {'items': [1]}
+        self.cacher['key']['items'].append(2)
+        self.assertEqual(self.cacher['key'], {'items': [1]})
+        self.assertEqual(self.cacher.near.hits, 2)
+
+    def test_immutable_stored_as_is(self):
+        value = ('a', 1, Decimal('1.5'))
+        self.cacher['key', 60] = value
+        self.assertIs(self.cacher['key'], value)
+
+    def test_expiry_and_eviction(self):
+        near = NearCache('', maxsize=2, ttl=1)
+        for key in 'abc':
+            near.store(key, key)
+        self.assertEqual((len(near), near.lookup('a'), near.lookup('c')), (2, _MISSING, 'c'))
+        near.store('d', 'd', timeout=0)
+        self.assertIs(near.lookup('d'), _MISSING)
+
+
+class CacheLockTests(SimpleTestCase):
+    def setUp(self):
+        clear_caches()
+        self.target = caches['default']
+
+    def test_release(self):
+        lock = CacheLock(self.target, 'lock', 10)
+        self.assertTrue(lock.acquire(blocking=False))
+        self.assertFalse(CacheLock(self.target, 'lock', 10).acquire(blocking=False))
+        lock.release()
+        self.assertIsNone(self.target.get('lock'))
+
+    def test_release_keeps_others_lock(self):
+        lock, other = CacheLock(self.target, 'lock', 10), CacheLock(self.target, 'lock', 10)
+        lock.acquire()
+        self.target.delete('lock')  # 模拟锁过期
+        other.acquire()
+        lock.release()
+        self.assertEqual(self.target.get('lock'), other.token)
+
+    def test_expiring_lock_left_to_expire(self):
+        # 持有时间可能已经超过 timeout 的锁不能安全地比较并删除。
+        lock = CacheLock(self.target, 'lock', 1)
+        lock.acquire()
+        lock.release()
+        self.assertEqual(self.target.get('lock'), lock.token)
+        self.assertFalse(lock.locked)
+
+    async def test_async(self):
+        lock = CacheLock(self.target, 'lock', 10)
+        self.assertTrue(await lock.aacquire(blocking=False))
+        await lock.arelease()
+        self.assertIsNone(await self.target.aget('lock'))
+
+
+class CountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(3)])
+
+    def setUp(self):
+        clear_caches()
+
+    @contextmanager
+    def postgresql(self, explained: str):
+        """
+        模拟 PostgreSQL，``QuerySet.explain(format='json')`` 返回 ``explained`` 。
+        """
+        with (
+            patch.object(connections['default'], 'vendor', 'postgresql'),
+            patch('django.db.models.QuerySet.explain', return_value=explained),
+        ):
+            yield
+
+    def test_exact(self):
+        self.assertEqual(count(User.objects.all()), 3)
+        self.assertEqual(count(User.objects.filter(username='user0')), 1)
+        self.assertEqual(count(User.objects.none()), 0)
+
+    def test_invalidated_on_save(self):
+        self.assertEqual(count(User.objects.all()), 3)
+        User.objects.create(username='user3')
+        self.assertEqual(count(User.objects.all()), 4)
+
+    def test_approximate(self):
+        for explained in ('{"Plan": {"Plan Rows": 5000}}', '[{"Plan": {"Plan Rows": 5000}}]'):
+            with self.subTest(explained=explained), self.postgresql(explained):
+                self.setUp()
+                self.assertEqual(count(User.objects.all(), approximate=1000), 5000)
+
+    def test_approximate_below_threshold(self):
+        with self.postgresql('{"Plan": {"Plan Rows": 10}}'):
+            self.assertEqual(count(User.objects.all(), approximate=1000), 3)
+
+    def test_approximate_cached_separately(self):
+        with self.postgresql('{"Plan": {"Plan Rows": 5000}}'):
+            self.assertEqual(count(User.objects.all(), approximate=1000), 5000)
+            self.assertEqual(count(User.objects.all()), 3)
+
+    def test_registered_at_startup(self):
+        for model in (User, User.groups.through, WechatUser):
+            with self.subTest(model=model):
+                self.assertIn(model, _counted)
+        self.assertTrue(m2m_changed.has_listeners(User.groups.through))
+        self.assertNotIn(Group, _counted)
+
+
+class UserSerializer(serializers.ModelSerializer):
+    display = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ('id', 'display')
+
+    def get_display(self, user: User) -> str:
+        return user.get_username()
+
+
+class UserPageView(MeowAPIView):
+    authentication_classes = ()
+    permission_classes = ()
+    serializer_class = UserSerializer
+    pagination_class = type('Pagination', (MeowCursorPagination,), {'page_size': 2})
+
+    def get(self, request, *args, **kwargs):
+        if 'serialized' in request.GET:
+            return self.paginate(UserSerializer(User.objects.order_by('id'), many=True).data)
+        return self.paginate(User.objects.all())
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(5)])
+
+    def setUp(self):
+        clear_caches()
+
+    def get(self, url: str = '/', view: type[MeowAPIView] = UserPageView) -> dict:
+        return view.as_view()(RequestFactory().get(url)).data
+
+    def test_envelope(self):
+        pages, url = [], '/'
+        while url:
+            body = self.get(url)
+            self.assertEqual((body['errcode'], body['pages']), (Errcode.DONE, 3))
+            pages.append([row['display'] for row in body['data']])
+            url = body['next']
+        self.assertEqual(pages, [['user4', 'user3'], ['user2', 'user1'], ['user0']])
+        self.assertIsNotNone(body['prev'])
+
+    def test_deep_page_costs_the_same(self):
+        body = self.get()
+        with self.assertNumQueries(1):
+            self.get(body['next'])
+
+    def test_without_total(self):
+        view = type(
+            'View',
+            (UserPageView,),
+            {'pagination_class': type('Pagination', (UserPageView.pagination_class,), {'total': None})},
+        )
+        body = self.get(view=view)
+        self.assertNotIn('pages', body)
+        self.assertEqual(len(body['data']), 2)
+
+    def test_serialized_data_not_reserialized(self):
+        view = type(
+            'View',
+            (UserPageView,),
+            {'pagination_class': type('Pagination', (MeowPageNumberPagination,), {'page_size': 2})},
+        )
+        body = self.get('/?serialized', view=view)
+        self.assertEqual([row['display'] for row in body['data']], ['user0', 'user1'])
+        self.assertEqual(body['pages'], 3)
+
+
+class UserStreamView(MeowAPIView):
+    authentication_classes = ()
+    permission_classes = ()
+
+    def get(self, request, *args, **kwargs):
+        return self.paginate(User.objects.order_by('id').values('id', 'username'), stream=True, chunk_size=2)
+
+
+class StreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(5)])
+
+    def assertEnvelope(self, chunks: list[bytes]):
+        # 头部、三块数据（每块两行）、尾部。
+        self.assertEqual(len(chunks), 5)
+        body = json.loads(b''.join(chunks))
+        self.assertEqual(body['errcode'], Errcode.DONE)
+        self.assertEqual([row['username'] for row in body['data']], [f'user{i}' for i in range(5)])
+
+    def test_wsgi(self):
+        response = UserStreamView.as_view()(RequestFactory().get('/'))
+        self.assertFalse(response.is_async)
+        self.assertEnvelope(list(response.streaming_content))
+
+    async def test_asgi(self):
+        response = await sync_to_async(UserStreamView.as_view())(AsyncRequestFactory().get('/'))
+        self.assertTrue(response.is_async)
+        self.assertEnvelope([chunk async for chunk in response.streaming_content])
@@ -1,3 +1,25 @@
-from django.shortcuts import render
+__all__ = [
+    'CacheStatsView',
+]
 
-# Create your views here.
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from commons.response import resp200
+from commons.views import MeowAPIView
+from utils.cache import cacher
+
+
+class CacheStatsView(MeowAPIView):
+    """
+    当前进程的缓存统计，仅限管理员访问。
+
+    - 需要在 Django Settings 中设置 ``CACHER_METRICS = True`` 才会统计命中率、延迟与大小。
+    - 每个 worker 进程各自统计，多进程部署时每次请求只能看到处理该请求的进程的数据。
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        return resp200(cacher.stats)
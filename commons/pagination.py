@@ -0,0 +1,250 @@
+__all__ = [
+    'MeowCursorPagination',
+    'MeowPageNumberPagination',
+    'count',
+    'count_models',
+    'count_tag',
+]
+
+import json
+from collections.abc import Callable
+from functools import cache, cached_property, partial
+from hashlib import blake2b
+from math import ceil
+from typing import Any, Literal
+
+from django.apps import apps
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Model, QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from commons.response import resp200
+from utils.cache import cacher, model_tag
+
+
+def count_tag(model: type[Model]) -> str:
+    """
+    模型相关的计数缓存的标签，形如 ``count:core.user`` 。
+
+    登记过的模型在保存或删除后会让对应的标签失效，参见 :func:`count_models` 。
+    """
+    return f'count:{model_tag(model)}'
+
+
+def count_models(*models: type[Model]) -> None:
+    """
+    登记模型：它的保存、删除以及（作为多对多的中间模型时）关系变更，都会让相关的计数缓存失效。
+
+    只有登记过的模型才会连接信号，其它模型的写入不会多出一次缓存写入。
+    登记需要在启动时完成，不分页、只写入的进程（比如管理命令、后台任务）才会同样让计数缓存失效。
+    项目 ``apps`` 包下的模型已在 ``CoreConfig.ready()`` 中登记，其它需要分页的模型（比如 Django 内置的）请同样在启动时登记。
+    """
+    for model in models:
+        if model in _counted:
+            continue
+        uid = f'{__name__}:{model_tag(model)}'
+        post_save.connect(_invalidate, sender=model, dispatch_uid=uid)
+        post_delete.connect(_invalidate, sender=model, dispatch_uid=uid)
+        if model._meta.auto_created:
+            m2m_changed.connect(_invalidate_relation, sender=model, dispatch_uid=uid)
+        _counted.add(model)
+
+
+_counted: set[type[Model]] = set()
+
+
+def _invalidate(sender: type[Model], **kwargs) -> None:
+    if not kwargs.get('raw'):
+        cacher.invalidate_tags(count_tag(sender))
+
+
+def _invalidate_relation(sender: type[Model], action: str, **kwargs) -> None:
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        cacher.invalidate_tags(count_tag(sender))
+
+
+def count(queryset: QuerySet, *, timeout: int = 60, approximate: int | None = None) -> int:
+    """
+    带缓存的 ``queryset.count()`` ，用于计算分页的总页数。
+
+    - 缓存键由规范化后的 SQL 与参数散列得到：去掉排序与选择的列，因此只是写法不同的查询集共用一份缓存；
+    - 查询涉及的已登记模型（包括关联查询连接的表）保存或删除后缓存失效，参见 :func:`count_models` 。未登记的模型以及
+      ``update()``、``bulk_create()`` 等不发送信号的批量操作，只能等待缓存过期，因此 ``timeout`` 应当较短；
+    - ``approximate`` 不为 ``None`` 且数据库是 PostgreSQL 时，先读取查询计划的行数估计，
+      估计值不小于 ``approximate`` 时直接使用，否则仍然精确计算。行数很多时精确的总数既昂贵又没有意义。
+
+    :param queryset: 要计数的查询集。
+    :param timeout: 缓存的超时时间（秒）。
+    :param approximate: 使用估计值的最小行数，``None`` 表示总是精确计算。
+    :return: 查询集的行数。
+    """
+    normalized = _normalize(queryset)
+    try:
+        sql, params = normalized.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    digest = blake2b(f'{queryset.db}\0{sql}\0{params!r}'.encode(), digest_size=16).hexdigest()
+    models = _involved(queryset)
+
+    def compute() -> int:
+        if approximate is not None and (estimate := _estimate(normalized) or 0) >= approximate:
+            return estimate
+        return queryset.count()
+
+    return cacher.get_or_set(
+        f'pagination:count:{approximate}:{digest}', compute, timeout, tags=[count_tag(model) for model in models]
+    )
+
+
+def _normalize(queryset: QuerySet) -> QuerySet:
+    """
+    去掉不影响行数的排序与选择的列。去重、分组、组合查询与切片的行数取决于这些部分，因此保持原样。
+    """
+    query = queryset.query
+    if query.is_sliced or query.distinct or query.group_by is not None or query.combinator:
+        return queryset
+    return queryset.order_by().values('pk')
+
+
+@cache
+def _models() -> dict[str, type[Model]]:
+    return {model._meta.db_table: model for model in apps.get_models(include_auto_created=True)}
+
+
+def _involved(queryset: QuerySet) -> list[type[Model]]:
+    tables = {queryset.model._meta.db_table} | {join.table_name for join in queryset.query.alias_map.values()}
+    return [model for table in sorted(tables) if (model := _models().get(table)) is not None]
+
+
+def _estimate(queryset: QuerySet) -> int | None:
+    """
+    PostgreSQL 查询计划中的行数估计，来自表的统计信息（``ANALYZE``）。其它数据库返回 ``None`` 。
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    # psycopg 把 EXPLAIN (FORMAT JSON) 的结果解码为列表，Django 再把列表中的元素逐个序列化，
+    # 因此通常得到的是 {"Plan": ...} ，但也兼容原样返回的 [{"Plan": ...}] 。
+    plan = json.loads(queryset.explain(format='json'))
+    if isinstance(plan, list):
+        plan = plan[0]
+    return int(plan['Plan']['Plan Rows'])
+
+
+class _CountedPaginator(Paginator):
+    def __init__(self, object_list, per_page, *, total: Callable[[QuerySet], int | None], **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.total = total
+
+    @cached_property
+    def count(self) -> int:
+        if isinstance(self.object_list, QuerySet) and (total := self.total(self.object_list)) is not None:
+            return total
+        return super().count
+
+
+class _TotalMixin:
+    """
+    通过 ``total`` 决定怎样得到总行数：
+
+    - ``'exact'`` 每次都 ``COUNT(*)`` ；
+    - ``'cached'`` 把 ``COUNT(*)`` 的结果缓存 ``total_timeout`` 秒，参见 :func:`count` ；
+    - ``'approximate'`` 同 ``'cached'`` ，但在 PostgreSQL 上行数估计不小于 ``approximate_above`` 时直接使用估计值；
+    - ``None`` 不计算总数。
+    """
+
+    total: Literal['exact', 'cached', 'approximate'] | None = 'cached'
+    total_timeout = 60
+    approximate_above = 100_000
+
+    def get_total(self, queryset: QuerySet) -> int | None:
+        """
+        查询集的总行数，按照 ``self.total`` 计算。
+        """
+        match self.total:
+            case None:
+                return None
+            case 'exact':
+                return queryset.count()
+            case 'cached':
+                return count(queryset, timeout=self.total_timeout)
+            case 'approximate':
+                return count(queryset, timeout=self.total_timeout, approximate=self.approximate_above)
+        raise ValueError(f'未知的 total 取值：{self.total!r}')
+
+
+class MeowPageNumberPagination(_TotalMixin, PageNumberPagination):
+    """
+    基于页码的分页器，以标准响应格式的 ``prev``、``next``、``pages`` 字段输出分页信息。
+
+    - 总页数默认来自缓存的 ``COUNT(*)`` ，参见 :func:`count` ；
+    - 页码分页总是需要总行数，``total`` 为 ``None`` 时等同于 ``'exact'`` ；
+    - 使用估计值时，最后几页的页码可能不准确；
+    - 页码越大，数据库需要扫描并丢弃的行越多。需要翻到很深的页时，请改用 :class:`MeowCursorPagination` 。
+    """
+
+    page_size = 20
+
+    @property
+    def django_paginator_class(self) -> Callable[..., Paginator]:
+        return partial(_CountedPaginator, total=self.get_total)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        return resp200(
+            data,
+            prev=self.get_previous_link(),
+            next=self.get_next_link(),
+            pages=self.page.paginator.num_pages,
+        )
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        response = super().get_paginated_response_schema(schema)
+        properties = response['properties']
+        properties['prev'] = properties.pop('previous')
+        properties['data'] = properties.pop('results')
+        properties['pages'] = properties.pop('count') | {'example': 9}
+        response['required'] = ['data', 'pages']
+        return response
+
+
+class MeowCursorPagination(_TotalMixin, CursorPagination):
+    """
+    基于键集（游标）的分页器，以标准响应格式的 ``prev``、``next``、``pages`` 字段输出分页信息。
+
+    偏移分页越往后越慢：数据库需要扫描并丢弃前面的所有行，``pages`` 还需要对整个查询集 ``COUNT(*)`` 。
+    键集分页改为从上一页最后一行的 ``ordering`` 字段值继续读取（比如 ``WHERE id < 42 ORDER BY id DESC LIMIT 21``），
+    只要该字段有索引，翻到第几页的代价都与第一页相同。
+
+    - ``ordering`` 应当是有索引且唯一的字段，比如 ``-id`` ，或者按时间有序的 ``uid``（uuid7）；
+    - 游标是不透明的字符串，客户端只能沿着 ``prev``、``next`` 翻页，不能跳到指定页；
+    - 只能对 :class:`QuerySet` 分页；
+    - ``total`` 为 ``None`` 时，响应中不会出现 ``pages`` 字段。
+    """
+
+    page_size = 20
+    ordering = '-id'
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> list | None:
+        page = super().paginate_queryset(queryset, request, view)
+        if page is not None:
+            self.count = self.get_total(queryset)
+        return page
+
+    def get_paginated_response(self, data: Any) -> Response:
+        fields = {'prev': self.get_previous_link(), 'next': self.get_next_link()}
+        if self.count is not None:
+            fields['pages'] = max(1, ceil(self.count / self.page_size))
+        return resp200(data, **fields)
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        response = super().get_paginated_response_schema(schema)
+        properties = response['properties']
+        properties['prev'] = properties.pop('previous')
+        properties['data'] = properties.pop('results')
+        properties['pages'] = {'type': 'integer', 'example': 9}
+        response['required'] = ['data']
+        return response
@@ -0,0 +1,41 @@
+__all__ = [
+    'MeowJSONRenderer',
+]
+
+from typing import Any
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class MeowJSONRenderer(JSONRenderer):
+    """
+    使用 `orjson <https://pypi.org/project/orjson/>`_ 直接把响应数据序列化为 bytes 的 JSON 渲染器。
+
+    - 输出与 :class:`JSONRenderer` 一致，切换渲染器不会改变响应的格式；
+    - 日期时间、``Decimal`` 等 orjson 不按 Django REST Framework 方式处理的类型，交由 :class:`JSONEncoder` 处理，
+      比如 UTC 时间输出为以 ``Z`` 结尾的 ISO 8601 字符串，``Decimal`` 输出为数字；
+      序列化器输出的字段已经按 ``DATETIME_FORMAT``、``COERCE_DECIMAL_TO_STRING`` 等设置转换为字符串，不受影响；
+    - 未安装 orjson、需要缩进（比如可浏览 API），或者 orjson 无法序列化（比如超出 64 位的整数）时，退回到 :class:`JSONRenderer` 。
+    """
+
+    def render(self, data: Any, accepted_media_type: str | None = None, renderer_context: dict | None = None) -> bytes:
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return orjson.dumps(
+                data, default=_encoder.default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except TypeError:
+            # orjson.JSONEncodeError 是 TypeError 的子类。
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+_encoder = JSONEncoder()
@@ -6,9 +6,22 @@ __all__ = [
 
 from typing import Any
 
+from django.conf import settings
+from django.core.signals import setting_changed
 from django.db.models import IntegerChoices
+from django.dispatch import receiver
 from rest_framework.response import Response
 
+# 是否校验响应格式。校验只用于开发与测试时发现错误的调用，生产环境中跳过以节省每个请求的开销。
+_validation: bool = getattr(settings, 'RESPONSE_VALIDATION', settings.DEBUG)
+
+
+@receiver(setting_changed)
+def _reload_validation(setting: str, **kwargs):
+    global _validation
+    if setting in ('RESPONSE_VALIDATION', 'DEBUG'):
+        _validation = getattr(settings, 'RESPONSE_VALIDATION', settings.DEBUG)
+
 
 # TODO: 以下错误码仅限参考，请根据项目实际需求增补、改编或重构。目前错误码暂未超出 16 位有符号整数的存储空间。
 class Errcode(IntegerChoices):
@@ -58,10 +71,11 @@ class Errcode(IntegerChoices):
         :param fields: 其它需要加入到响应报文的字段，不能含有 ``errcode``、``message`` 与 ``context`` 三个字段。
         :return: Django REST Framework 响应对象 :class:`Response` 。
         """
-        assert 'errcode' not in fields, f'{self!r}() 不能接受名为 errcode 的额外参数，请改用 code= 传递，或重命名。'
-        assert 'message' not in fields, f'{self!r}() 不能接受名为 message 的额外参数，请改用 msg= 传递，或重命名。'
-        assert 'context' not in fields, f'{self!r}() 不能接受名为 context 的额外参数，请改用 ctx= 传递，或重命名。'
-        assert not self.ok, f'请使用 {resp200.__name__}(code={self!r}) 代替 {self!r}() 构造响应对象。'
+        if _validation:
+            assert 'errcode' not in fields, f'{self!r}() 不能接受名为 errcode 的额外参数，请改用 code= 传递，或重命名。'
+            assert 'message' not in fields, f'{self!r}() 不能接受名为 message 的额外参数，请改用 msg= 传递，或重命名。'
+            assert 'context' not in fields, f'{self!r}() 不能接受名为 context 的额外参数，请改用 ctx= 传递，或重命名。'
+            assert not self.ok, f'请使用 {resp200.__name__}(code={self!r}) 代替 {self!r}() 构造响应对象。'
         body = _standardize(data, errcode=self, message=msg, context=ctx, **fields)
         return Response(body)
 
@@ -83,16 +97,23 @@ def _standardize(
     :param fields: 其它需要加入到响应报文的字段。
     :return: 一个字典。
     """
-    body = {
-        'errcode': errcode.value,
-        'message': message or errcode.label,
-        'context': context,
-        'data': data,
-        **fields,
-    }
-    if body['context'] is None:
-        body.pop('context')
+    if context is None:
+        body = {'errcode': errcode.value, 'message': message or errcode.label, 'data': data}
+    else:
+        body = {'errcode': errcode.value, 'message': message or errcode.label, 'context': context, 'data': data}
+    if fields:
+        body.update(fields)
+        if 'context' in body and body['context'] is None:
+            body.pop('context')
+    if _validation:
+        _validate(body)
+    return body
 
+
+def _validate(body: dict) -> None:
+    """
+    校验响应格式，只在 ``settings.RESPONSE_VALIDATION`` 开启时进行。
+    """
     assert 'data' in body, 'API 响应缺少 "data" 字段。'
     assert 'errcode' in body, 'API 响应缺少 "errcode" 字段。'
     assert 'message' in body, 'API 响应缺少 "message" 字段。'
@@ -103,7 +124,6 @@ def _standardize(
         assert body['context'] is not None, '"context" 字段为空时不应出现在 API 响应中。'
     if 'pages' in body:
         assert type(body['pages']) is int, 'API 响应的 "pages" 字段必须是 int 类型。'
-    return body
 
 
 # 该函数可能会被高频使用，因此简写参数名。
@@ -138,9 +158,10 @@ def resp200(
     :param fields: 其它需要加入到响应报文的字段，不能含有 ``errcode``，``message`` 与 ``context`` 三个字段。
     :return: Django REST Framework 响应对象 :class:`Response` 。
     """
-    assert 'errcode' not in fields, f'{resp200.__name__}() 不接受名为 errcode 的额参数，请改用 code= 传递。'
-    assert 'message' not in fields, f'{resp200.__name__}() 不接受名为 message 的额参数，请改用 msg= 传递。'
-    assert 'context' not in fields, f'{resp200.__name__}() 不接受名为 context 的额参数，请改用 ctx= 传递。'
+    if _validation:
+        assert 'errcode' not in fields, f'{resp200.__name__}() 不接受名为 errcode 的额参数，请改用 code= 传递。'
+        assert 'message' not in fields, f'{resp200.__name__}() 不接受名为 message 的额参数，请改用 msg= 传递。'
+        assert 'context' not in fields, f'{resp200.__name__}() 不接受名为 context 的额参数，请改用 ctx= 传递。'
     body = _standardize(data, errcode=code, message=msg, context=ctx, **fields)
     return Response(body)
 
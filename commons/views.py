@@ -8,16 +8,21 @@ __all__ = [
 ]
 
 import sys
+from collections.abc import AsyncIterator, Iterable, Iterator
 from contextlib import AbstractContextManager, ContextDecorator
 from inspect import currentframe
+from itertools import islice
 from typing import Any
 
+from asgiref.sync import sync_to_async
 from django.core.exceptions import (
     ObjectDoesNotExist,
     ValidationError as DjangoValidationError,
 )
+from django.core.handlers.asgi import ASGIRequest
 from django.db import IntegrityError
-from django.db.models import QuerySet
+from django.db.models import Model, QuerySet
+from django.http import StreamingHttpResponse
 from rest_framework import mixins, status
 from rest_framework.exceptions import (
     APIException,
@@ -31,6 +36,7 @@ from rest_framework.response import Response
 from rest_framework.views import exception_handler
 
 from commons.exceptions import MeowViewException, APINotImplemented
+from commons.renderers import MeowJSONRenderer
 from commons.response import Errcode, standardize, resp200
 from utils.http import HTTPMethod
 from utils.views import EasyViewSetMixin
@@ -199,18 +205,76 @@ class MeowAPIView(GenericAPIView):
         else:
             return super().handle_exception(exc)
 
-    def paginate(self, data: list | tuple | QuerySet) -> Response:
+    def paginate(
+        self,
+        data: list | tuple | QuerySet,
+        *,
+        stream: bool = False,
+        chunk_size: int = 2000,
+    ) -> Response | StreamingHttpResponse:
         """
         对任意数据分页，并返回分页后的响应。
 
         - 需要定义 ``self.pagination_class`` 或在 Django Settings
           中配置 ``REST_FRAMEWORK.DEFAULT_PAGINATION_CLASS``。
+        - :class:`commons.pagination.MeowPageNumberPagination` 缓存总行数，避免每次请求都 ``COUNT(*)`` ；
+          数据量大、需要翻到很深的页时，建议使用键集分页 :class:`commons.pagination.MeowCursorPagination` 。
+        - 当前页是模型实例（比如对 :class:`QuerySet` 分页）且定义了 ``self.serializer_class`` 时，序列化当前页；
+          其它数据（比如 ``serializer.data`` 或字典列表）需要本身能够序列化为 JSON，会原样返回。
+        - 流式模式下不分页，而是逐块读取并输出全部数据，内存占用与数据量无关。参见 :meth:`stream` 。
         """
+        if stream:
+            return self.stream(data, chunk_size=chunk_size)
         if self.paginator is None:
             return resp200(data)
         page = self.paginate_queryset(data)
+        # 只序列化模型实例，已经序列化过的数据（比如 serializer.data 、字典列表）原样返回。
+        if self.serializer_class is not None and page and isinstance(page[0], Model):
+            page = self.get_serializer(page, many=True).data
         return self.get_paginated_response(page)
 
+    def stream(self, data: Iterable, *, chunk_size: int = 2000) -> StreamingHttpResponse:
+        """
+        以标准格式流式输出全部数据，适用于导出等数据量很大的场景。
+
+        - :class:`QuerySet` 通过 ``.iterator(chunk_size)`` 读取，在 PostgreSQL 等数据库上使用服务端游标；
+        - 定义了 ``self.serializer_class`` 时逐块序列化，否则数据本身需要能够序列化为 JSON（比如 ``.values()``）；
+        - 响应头发出后无法再更改状态码，因此中途出错时客户端只会收到不完整的 JSON；
+        - 在 ASGI 下输出异步迭代器，逐块在同步线程中读取与序列化，否则 Django 会把同步迭代器整个读入内存后才发送。
+
+        :param data: 要输出的数据。
+        :param chunk_size: 每次从数据库读取、序列化并输出的行数。
+        """
+        renderer = MeowJSONRenderer()
+        envelope = renderer.render(resp200([]).data)
+        head, tail = envelope.rsplit(b'[]', 1)
+        chunks = self._stream(data, renderer, head + b'[', b']' + tail, chunk_size)
+        if isinstance(self.request._request, ASGIRequest):
+            chunks = self._astream(chunks)
+        return StreamingHttpResponse(chunks, content_type=renderer.media_type)
+
+    def _stream(self, data: Iterable, renderer, head: bytes, tail: bytes, chunk_size: int) -> Iterator[bytes]:
+        rows = data.iterator(chunk_size=chunk_size) if isinstance(data, QuerySet) else iter(data)
+        yield head
+        separator = b''
+        while chunk := list(islice(rows, chunk_size)):
+            if self.serializer_class is not None:
+                chunk = self.get_serializer(chunk, many=True).data
+            # 去掉数组两端的方括号，拼接到同一个数组中。
+            yield separator + renderer.render(chunk)[1:-1]
+            separator = b','
+        yield tail
+
+    @staticmethod
+    async def _astream(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+        # 服务端游标只能在打开它的线程中使用，thread_sensitive 保证每一块都在同一个同步线程中读取。
+        next_chunk = sync_to_async(next, thread_sensitive=True)
+        try:
+            while (chunk := await next_chunk(chunks, None)) is not None:
+                yield chunk
+        finally:
+            await sync_to_async(chunks.close, thread_sensitive=True)()
+
 
 class MeowViewSet(EasyViewSetMixin, MeowAPIView):
     """
@@ -256,7 +320,7 @@ class MeowModelViewSet(
 
         method = HTTPMethod(request.method)
 
-        if method == HTTPMethod.OPTIONS:
+        if method == HTTPMethod.OPTIONS or not isinstance(response, Response):
             return old
 
         if response.content_type == JSONRenderer.media_type or response.content_type is None:
@@ -8,6 +8,7 @@ django_template_repo 的项目设置。
 - `settings.py 完整配置列表 <https://docs.djangoproject.com/zh-hans/5.2/ref/settings/>`_
 """
 
+import sys
 from pathlib import Path
 
 from zeraora.conf import logc
@@ -88,6 +89,9 @@ SECRET_KEY = None
 # 切勿在生产环境中开启！！！
 DEBUG = False
 
+# 是否正在运行测试（manage.py test 或 pytest）
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
 # 域名／IP 白名单
 # https://docs.djangoproject.com/zh-hans/5.2/ref/settings/#allowed-hosts
 # 注意，DEBUG=False 时必须配置为非空列表。
@@ -329,7 +333,7 @@ REST_FRAMEWORK = dict(
     EXCEPTION_HANDLER='commons.views.meow_exception_handler',
     # API 策略
     DEFAULT_RENDERER_CLASSES=[
-        'rest_framework.renderers.JSONRenderer',
+        'commons.renderers.MeowJSONRenderer',
         # TODO: 如果不希望（通过浏览器）直接访问接口时自动展示接口信息，可以去掉下面这行：
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
@@ -346,6 +350,10 @@ REST_FRAMEWORK = dict(
     DEFAULT_THROTTLE_CLASSES=[
         #
     ],
+    # 分页
+    # https://www.django-rest-framework.org/api-guide/pagination/
+    # TODO: 如果需要默认分页，可以取消下面这行的注释（数据量大、需要翻到很深的页时改用 MeowCursorPagination）：
+    # DEFAULT_PAGINATION_CLASS='commons.pagination.MeowPageNumberPagination',
     # 时间处理
     DATE_FORMAT='%Y-%m-%d',
     TIME_FORMAT='%H:%M:%S',
@@ -365,4 +373,10 @@ EGO_ENDPOINT = 'https://localhost:23333'
 WECHAT_APP_ID = ''
 WECHAT_APP_SECRET = ''
 
+# 是否统计 utils.cache.cacher 的命中率、后端延迟与缓存值大小（可通过 /metrics/cache 查看）
+CACHER_METRICS = False
+
+# 是否校验 API 响应的标准格式（commons.response），默认只在调试模式下与运行测试时校验
+RESPONSE_VALIDATION = DEBUG or TESTING
+
 # ...
@@ -8,6 +8,9 @@ django_template_repo 项目的根路由配置。
 from django.contrib import admin
 from django.urls import path
 
+from apps.core.views import CacheStatsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/cache', CacheStatsView.as_view()),
 ]
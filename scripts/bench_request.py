@@ -0,0 +1,313 @@
+"""
+ServiceRequest / WeChatRequest 的离线压测。
+
+在子进程中启动一个模拟微信 API（``/sns/jscode2session`` 与 ``/cgi-bin/token``）的本地服务，
+按指定的并发数调用 :class:`WeChatRequest` ，统计延迟分位数、吞吐量、每次调用的 CPU 时间与内存分配，
+以及构造请求对象的耗时。
+
+用法::
+
+    python scripts/bench_request.py --requests 2000 --concurrency 16 --latency 20
+    python scripts/bench_request.py --save bench.json
+    python scripts/bench_request.py --compare bench.json --tolerance 0.15
+
+``--compare`` 在任一指标比基线差超过容差时以状态码 1 退出，可以直接用在 CI 中。
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Process, Queue
+from pathlib import Path
+from statistics import mean
+from urllib.parse import urlparse
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+APIS = {
+    'code2session': '/sns/jscode2session',
+    'token': '/cgi-bin/token',
+}
+
+# 指标越大越好还是越小越好，用于和基线比较。
+METRICS = {
+    'p50_ms': 'lower',
+    'p99_ms': 'lower',
+    'rps': 'higher',
+    'cpu_ms': 'lower',
+    'alloc_kb': 'lower',
+    'construct_us': 'lower',
+}
+
+
+def serve(queue: Queue, latency: float, errcode: int, error_rate: float):
+    """
+    模拟微信 API 的本地服务，在子进程中运行，避免与压测端争抢 GIL。
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True  # 否则响应头与响应体分两次写入时，会多出 40ms 的延迟确认。
+
+        def do_GET(self):
+            time.sleep(latency)
+            match urlparse(self.path).path:
+                case _ if errcode and random.random() < error_rate:
+                    body = {'errcode': errcode, 'errmsg': 'stub error'}
+                case '/sns/jscode2session':
+                    body = {'openid': 'o' * 28, 'session_key': 'k' * 24, 'unionid': 'u' * 28}
+                case '/cgi-bin/token':
+                    body = {'access_token': 't' * 136, 'expires_in': 7200}
+                case _:
+                    body = {'errcode': 404, 'errmsg': 'not found'}
+            content = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    queue.put(server.server_port)
+    server.serve_forever()
+
+
+def setup():
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+    import django
+    from django.conf import settings
+
+    settings.configure(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        LOGGING_CONFIG=None,
+        WECHAT_APP_ID='bench',
+        WECHAT_APP_SECRET='bench',
+    )
+    django.setup()
+
+
+def build(endpoint: str, options: argparse.Namespace):
+    from api.wechat import WeChatRequest
+
+    class BenchRequest(WeChatRequest):
+        pool_maxsize = options.concurrency
+        concurrency = None
+        breaker = None
+        retry = WeChatRequest.retry if options.retry else None
+
+    BenchRequest.endpoint = endpoint
+    return BenchRequest
+
+
+def call(request, api: str):
+    if api == 'code2session':
+        return request.code2session('code')
+    return request.getAccessToken()
+
+
+async def acall(request, api: str):
+    if api == 'code2session':
+        return await request.acode2session('code')
+    return await request.agetAccessToken()
+
+
+def timed(request, api: str) -> tuple[float, float, bool]:
+    cpu, start = time.thread_time(), time.perf_counter()
+    try:
+        call(request, api)
+        ok = True
+    except Exception:  # noqa: BLE001 -- 压测只统计失败的次数，任何异常都算作一次失败
+        ok = False
+    return time.perf_counter() - start, time.thread_time() - cpu, ok
+
+
+def run_sync(request, options: argparse.Namespace) -> tuple[list[float], list[float], int, float]:
+    with ThreadPoolExecutor(max_workers=options.concurrency) as executor:
+        list(executor.map(lambda _: timed(request, options.api), range(options.concurrency)))  # 预热连接池
+        start = time.perf_counter()
+        results = list(executor.map(lambda _: timed(request, options.api), range(options.requests)))
+        elapsed = time.perf_counter() - start
+    latencies = [latency for latency, _, _ in results]
+    cpu = [cpu for _, cpu, _ in results]
+    return latencies, cpu, sum(not ok for _, _, ok in results), elapsed
+
+
+async def run_async(request, options: argparse.Namespace) -> tuple[list[float], list[float], int, float]:
+    semaphore = asyncio.Semaphore(options.concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await acall(request, options.api)
+            except Exception:  # noqa: BLE001 -- 任何异常都算作一次失败
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(options.concurrency)))  # 预热连接池
+    latencies.clear()
+    errors = 0
+    cpu, start = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(options.requests)))
+    elapsed = time.perf_counter() - start
+    # 事件循环在单个线程中运行，只能得到平均每次调用的 CPU 时间。
+    per_call = (time.process_time() - cpu) / options.requests
+    return latencies, [per_call] * options.requests, errors, elapsed
+
+
+def allocations(request, options: argparse.Namespace) -> float:
+    """
+    顺序调用若干次，统计每次调用的内存分配峰值（KiB）。开启 tracemalloc 会明显拖慢调用，因此不与计时一同进行。
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        call(request, options.api)  # 预热
+        for _ in range(options.samples):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            call(request, options.api)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+    return mean(peaks) / 1024
+
+
+async def aallocations(request, options: argparse.Namespace) -> float:
+    """
+    :func:`allocations` 的异步版本，所有调用在同一个事件循环中进行，以复用连接。
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        await acall(request, options.api)  # 预热
+        for _ in range(options.samples):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            await acall(request, options.api)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+    return mean(peaks) / 1024
+
+
+async def bench_async(request, options: argparse.Namespace):
+    return *await run_async(request, options), await aallocations(request, options)
+
+
+def bench_sync(request, options: argparse.Namespace):
+    return *run_sync(request, options), allocations(request, options)
+
+
+def construction(request, options: argparse.Namespace) -> float:
+    """
+    构造一次请求对象并读取三次 URL 的耗时（微秒），不发出请求。
+    """
+    path = APIS[options.api]
+    params = (
+        request._code2session_params('code', None, None)
+        if options.api == 'code2session'
+        else request._access_token_params(None, None)
+    )
+
+    def construct():
+        instance = request('GET', path, params=params)
+        return instance.url, instance.url, instance.url
+
+    number = 10000
+    return timeit.timeit(construct, number=number) / number * 1e6
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for metric, better in METRICS.items():
+        old, new = baseline.get(metric), report[metric]
+        if not old:
+            continue
+        change = (new - old) / old
+        if (better == 'lower' and change > tolerance) or (better == 'higher' and change < -tolerance):
+            regressions.append(f'{metric}: {old:.3f} -> {new:.3f} ({change:+.1%})')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ServiceRequest / WeChatRequest 的离线压测。')
+    parser.add_argument('--api', choices=APIS, default='code2session', help='压测的微信 API。')
+    parser.add_argument('--requests', type=int, default=1000, help='请求总数。')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发数。')
+    parser.add_argument('--latency', type=float, default=0, help='模拟服务的响应延迟（毫秒）。')
+    parser.add_argument('--errcode', type=int, default=0, help='模拟服务返回的错误码。')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回错误码的比例。')
+    parser.add_argument('--retry', action='store_true', help='启用 WeChatRequest 的默认重试策略。')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='使用异步方法（需要安装 httpx）。')
+    parser.add_argument('--samples', type=int, default=50, help='统计内存分配时调用的次数。')
+    parser.add_argument('--save', type=Path, help='把结果保存为基线。')
+    parser.add_argument('--compare', type=Path, help='与基线比较，变差超过容差时以状态码 1 退出。')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='与基线比较的容差比例。')
+    options = parser.parse_args()
+
+    queue = Queue()
+    stub = Process(target=serve, args=(queue, options.latency / 1000, options.errcode, options.error_rate), daemon=True)
+    stub.start()
+    try:
+        endpoint = f'http://127.0.0.1:{queue.get(timeout=10)}'
+        setup()
+        request = build(endpoint, options)
+        if options.use_async:
+            latencies, cpu, errors, elapsed, alloc = asyncio.run(bench_async(request, options))
+        else:
+            latencies, cpu, errors, elapsed, alloc = bench_sync(request, options)
+    finally:
+        stub.terminate()
+
+    report = {
+        'api': options.api,
+        'mode': 'async' if options.use_async else 'sync',
+        'requests': options.requests,
+        'concurrency': options.concurrency,
+        'latency_ms': options.latency,
+        'errors': errors,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'rps': options.requests / elapsed,
+        'cpu_ms': mean(cpu) * 1000,
+        'alloc_kb': alloc,
+        'construct_us': construction(request, options),
+    }
+    print(json.dumps(report, indent=2))
+
+    if options.save:
+        options.save.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f'已保存基线 {options.save}')
+    if options.compare:
+        regressions = compare(report, json.loads(options.compare.read_text(encoding='utf-8')), options.tolerance)
+        if regressions:
+            print('相比基线变差：')
+            print('\n'.join(f'  {line}' for line in regressions))
+            sys.exit(1)
+        print('未发现明显变差。')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+标准响应格式的微基准测试：
+
+- 构造响应格式时，比较原先每次都校验的实现与跳过校验的快速路径；
+- 渲染大列表时，比较 Django REST Framework 的 ``JSONRenderer`` 与 ``MeowJSONRenderer`` 。
+
+用法::
+
+    python scripts/bench_response.py --number 200000
+"""
+
+import argparse
+import sys
+import timeit
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup():
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+    import django
+    from django.conf import settings
+
+    settings.configure(RESPONSE_VALIDATION=False, USE_TZ=True)
+    django.setup()
+
+
+def legacy(data: Any, errcode, message: str | None = None, context: Any = None, **fields: Any) -> dict:
+    # 优化前的 commons.response._standardize() ，作为对照。
+    body = {
+        'errcode': errcode.value,
+        'message': message or errcode.label,
+        'context': context,
+        'data': data,
+        **fields,
+    }
+    if body['context'] is None:
+        body.pop('context')
+
+    assert 'data' in body, 'API 响应缺少 "data" 字段。'
+    assert 'errcode' in body, 'API 响应缺少 "errcode" 字段。'
+    assert 'message' in body, 'API 响应缺少 "message" 字段。'
+    assert type(body['errcode']) is int, 'API 响应的 "errcode" 字段必须是 int 类型。'
+    assert type(body['message']) is str, 'API 响应的 "message" 字段必须是 str 类型。'
+    assert body['message'], 'API 响应的 "message" 字段不允许为空字符串。'
+    if 'context' in body:
+        assert body['context'] is not None, '"context" 字段为空时不应出现在 API 响应中。'
+    if 'pages' in body:
+        assert type(body['pages']) is int, 'API 响应的 "pages" 字段必须是 int 类型。'
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description='标准响应格式构造的微基准测试。')
+    parser.add_argument('--number', type=int, default=100000, help='构造响应格式时，每种情况的调用次数。')
+    parser.add_argument('--rows', type=int, default=1000, help='渲染的列表长度。')
+    options = parser.parse_args()
+
+    setup()
+
+    from django.test import override_settings
+
+    from commons import response
+    from commons.response import Errcode, resp200
+
+    data = {'id': 1, 'name': 'meow'}
+    cases = {
+        'data': lambda standardize: standardize(data, errcode=Errcode.DONE),
+        'page': lambda standardize: standardize([data], errcode=Errcode.DONE, prev=None, next='/?page=2', pages=9),
+        'error': lambda standardize: standardize(None, errcode=Errcode.INVALID_PARAMS, context={'name': ['必填']}),
+    }
+    for name, case in cases.items():
+        assert case(legacy) == case(response._standardize), f'{name} 的响应格式与优化前不一致。'
+
+    print(f'{"情况":<12}{"优化前":>10}{"校验":>10}{"快速路径":>10}（微秒／次）')
+    for name, case in cases.items():
+        row = [timeit.timeit(lambda case=case: case(legacy), number=options.number)]
+        with override_settings(RESPONSE_VALIDATION=True):
+            row.append(timeit.timeit(lambda case=case: case(response._standardize), number=options.number))
+        row.append(timeit.timeit(lambda case=case: case(response._standardize), number=options.number))
+        print(f'{name:<12}' + ''.join(f'{seconds / options.number * 1e6:>10.3f}' for seconds in row))
+
+    seconds = timeit.timeit(lambda: resp200(data), number=options.number)
+    print(f'{"resp200()":<12}{"":>20}{seconds / options.number * 1e6:>10.3f}')
+
+    from django.utils import timezone
+    from rest_framework.renderers import JSONRenderer
+
+    from commons.renderers import MeowJSONRenderer
+
+    now = timezone.now()
+    rows = [
+        {'id': i, 'uid': uuid4(), 'name': f'用户{i}', 'balance': Decimal('12.50'), 'joined': now, 'tags': ['a', 'b']}
+        for i in range(options.rows)
+    ]
+    body = response._standardize(rows, errcode=Errcode.DONE, prev=None, next=None, pages=1)
+    number = max(1, options.number // options.rows)
+    print(f'\n渲染 {options.rows} 行（毫秒／次）')
+    for renderer in (JSONRenderer(), MeowJSONRenderer()):
+        seconds = timeit.timeit(lambda renderer=renderer: renderer.render(body), number=number)
+        print(f'{type(renderer).__name__:<20}{seconds / number * 1e3:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,44 +1,1270 @@
 __all__ = [
+    'CacheLock',
+    'CacheMetrics',
     'Cacher',
+    'Codec',
+    'NearCache',
+    'cached',
     'cacher',
+    'model_tag',
 ]
 
+from asyncio import sleep as asleep
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Awaitable, Callable, Container, Iterable, Iterator, Mapping, Sequence
+from copy import copy
+from datetime import date, datetime, time as dtime, timedelta
+from decimal import Decimal
+from enum import Enum
+from functools import cache, wraps
+from hashlib import blake2b
+from inspect import iscoroutinefunction, signature
+from math import log
+from pickle import HIGHEST_PROTOCOL, PicklingError, dumps as pickle_dumps, loads as pickle_loads
+from random import random
+from threading import Lock
+from time import monotonic, perf_counter, sleep, time
 from typing import Any
+from uuid import UUID, uuid4
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.cache import caches
+from django.db.models import Model
+from django.http import QueryDict
+
+_MISSING = object()
+_TAG = 'tag:'
+
+
+def _timeout(t: slice | int) -> int:
+    """
+    将 ``int`` 或 ``时:分:秒`` 形式的切片转换为以秒为单位的超时时间。
+    """
+    match t:
+        case int():
+            return t
+        case slice():
+            return (t.start or 0) * 3600 + (t.stop or 0) * 60 + (t.step or 0)
+        case _:
+            raise TypeError(f'Cacher 不接受 {type(t).__name__} 类型的 timeout 值。')
+
+
+class _Entry:
+    """
+    带有元数据的缓存值。
+
+    - 由 :meth:`Cacher.get_or_set` 写入时记录了重算耗时与过期时刻，用于 XFetch 提前重算；
+    - 带有标签时记录了写入时各个标签的版本号，读取时版本号不一致即视为失效。
+    """
+
+    __slots__ = ('delta', 'expiry', 'tags', 'value')
+
+    def __init__(self, value: Any, delta: float, expiry: float, tags: dict[str, str] | None = None):
+        self.value = value
+        self.delta = delta
+        self.expiry = expiry
+        self.tags = tags
+
+    def due(self, beta: float) -> bool:
+        """
+        按 XFetch 算法判断是否应当提前重算：越接近过期、重算越慢，越有可能返回 ``True`` 。
+        """
+        return beta > 0 and time() - self.delta * beta * log(1 - random()) >= self.expiry
+
+
+def _unwrap(raw: Any) -> Any:
+    return raw.value if isinstance(raw, _Entry) else raw
+
+
+def _tag(value: Any, timeout: int, versions: dict[str, str]) -> _Entry:
+    if not isinstance(value, _Entry):
+        value = _Entry(value, 0.0, time() + timeout)
+    value.tags = versions
+    return value
+
+
+def _tagged_entries(found: dict[str, Any]) -> dict[str, dict[str, str]]:
+    return {key: raw.tags for key, raw in found.items() if isinstance(raw, _Entry) and raw.tags}
+
+
+def _version_keys(tagged: dict[str, dict[str, str]]) -> list[str]:
+    return list({_TAG + tag for tags in tagged.values() for tag in tags})
+
+
+def _outdated(tagged: dict[str, dict[str, str]], versions: dict[str, str]) -> list[str]:
+    return [key for key, tags in tagged.items() if any(versions.get(_TAG + t) != v for t, v in tags.items())]
+
+
+class _Packed(bytes):
+    """
+    经过 :class:`Codec` 编码的缓存值。前两个字节分别是编解码器与压缩算法的编号，其余是数据。
+    """
+
+
+_CODECS = {'pickle': 1, 'json': 2, 'orjson': 3, 'msgpack': 4}
+_COMPRESSORS = {None: 0, 'zlib': 1, 'lz4': 2}
+
+
+@cache
+def _serializer(ident: int) -> tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    # 按需导入三方库，未安装时只有真正用到才会报错。
+    match ident:
+        case 1:
+            return lambda v: pickle_dumps(v, HIGHEST_PROTOCOL), pickle_loads
+        case 2:
+            import json
+
+            return lambda v: json.dumps(v, ensure_ascii=False, separators=(',', ':')).encode(), json.loads
+        case 3:
+            import orjson
+
+            return orjson.dumps, orjson.loads
+        case 4:
+            import msgpack
+
+            return lambda v: msgpack.packb(v, use_bin_type=True), lambda b: msgpack.unpackb(b, raw=False)
+        case _:
+            raise ValueError(f'未知的缓存编解码器编号 {ident} 。')
+
+
+@cache
+def _compressor(ident: int, level: int | None = None) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    match ident:
+        case 1:
+            import zlib
+
+            return lambda b: zlib.compress(b, -1 if level is None else level), zlib.decompress
+        case 2:
+            import lz4.frame
+
+            return lambda b: lz4.frame.compress(b, 0 if level is None else level), lz4.frame.decompress
+        case _:
+            raise ValueError(f'未知的缓存压缩算法编号 {ident} 。')
+
+
+class Codec:
+    """
+    缓存值的编解码器，负责序列化以及按大小压缩。
+
+    - 编码结果带有两个字节的头部，记录了编解码器与压缩算法，因此更换编解码器后旧的缓存值仍然可以读取，无需清空缓存。
+    - ``json``、``orjson``、``msgpack`` 只支持对应格式能表达的类型；``msgpack``、``lz4`` 需要安装可选依赖 ``cache``，``orjson`` 需要安装可选依赖 ``speedups``。
+    - 序列化后不小于 ``threshold`` 字节的值才会压缩，且只有压缩后确实变小才会保留压缩结果。
+    """
+
+    def __init__(
+        self,
+        name: str = 'pickle',
+        compress: str | None = None,
+        *,
+        threshold: int = 1024,
+        level: int | None = None,
+    ):
+        """
+        :param name: 编解码器，可以是 ``pickle``、``json``、``orjson``、``msgpack``。
+        :param compress: 压缩算法，可以是 ``zlib``、``lz4``，``None`` 表示不压缩。
+        :param threshold: 触发压缩的最小字节数。
+        :param level: 压缩等级，默认使用压缩算法自己的默认值。
+        """
+        if name not in _CODECS:
+            raise ValueError(f'不支持的缓存编解码器 {name} 。')
+        if compress not in _COMPRESSORS:
+            raise ValueError(f'不支持的缓存压缩算法 {compress} 。')
+        self.name = name
+        self.compress = compress
+        self.threshold = threshold
+        self.level = level
+        self._dumps, _ = _serializer(_CODECS[name])
+        self._compress = _compressor(_COMPRESSORS[compress], level)[0] if compress else None
+        self.packed = 0
+        self.compressed = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def pack(self, value: Any) -> _Packed:
+        data = self._dumps(value)
+        header = bytes((_CODECS[self.name], 0))
+        compressible = self._compress is not None and len(data) >= self.threshold
+        if compressible and len(squeezed := self._compress(data)) < len(data):
+            header = bytes((_CODECS[self.name], _COMPRESSORS[self.compress]))
+            self.compressed += 1
+            self.raw_bytes += len(data)
+            self.stored_bytes += len(squeezed)
+            data = squeezed
+        self.packed += 1
+        return _Packed(header + data)
+
+    @staticmethod
+    def unpack(packed: _Packed) -> Any:
+        codec, compressor = packed[0], packed[1]
+        data = packed[2:]
+        if compressor:
+            data = _compressor(compressor)[1](data)
+        return _serializer(codec)[1](data)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """
+        编码次数、压缩次数，以及被压缩的值压缩前后的字节数与节省的字节数。
+        """
+        return {
+            'packed': self.packed,
+            'compressed': self.compressed,
+            'raw_bytes': self.raw_bytes,
+            'stored_bytes': self.stored_bytes,
+            'saved_bytes': self.raw_bytes - self.stored_bytes,
+        }
+
+
+class NearCache:
+    """
+    进程内的 LRU 近端缓存，放在共享的缓存后端前面，为热点键省去一次网络往返。
+
+    - 只缓存以 ``prefixes`` 中任意一个开头的键，传入完整的键即可精确匹配单个键；传入 ``''`` 则缓存所有键。
+    - 条目在本地最多存活 ``ttl``，因此其它进程写入后，当前进程最多读到这么久的旧值。
+    - 超出 ``maxsize`` 时淘汰最久未使用的条目。
+    - 不可变的值（数字、字符串、日期时间以及由它们组成的元组等）原样保存，其它值序列化后保存、每次读取时反序列化，
+      因此调用方修改读到的值不会影响之后的读取，与从缓存后端读取的行为一致。
+    """
+
+    def __init__(self, *prefixes: str, maxsize: int = 1024, ttl: slice | int = 5):
+        """
+        :param prefixes: 需要在本地缓存的键前缀。
+        :param maxsize: 本地最多缓存多少个条目。
+        :param ttl: 条目在本地的最长存活时间，可以是秒数，也可以是 ``时:分:秒`` 形式的切片。
+        """
+        assert maxsize > 0, 'NearCache 的 maxsize 必须大于 0。'
+        self.prefixes = prefixes
+        self.maxsize = maxsize
+        self.ttl = _timeout(ttl)
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def accepts(self, key: str) -> bool:
+        """
+        键是否需要在本地缓存？
+        """
+        return key.startswith(self.prefixes)
+
+    def lookup(self, key: str) -> Any:
+        """
+        读取本地条目，不存在或已过期时返回 ``_MISSING``。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # 在锁外反序列化，不阻塞其它线程。
+        value = entry[1]
+        return pickle_loads(value) if isinstance(value, _Pickled) else value
+
+    def store(self, key: str, value: Any, timeout: int | None = None) -> None:
+        """
+        写入本地条目，存活时间取 ``timeout`` 与 ``self.ttl`` 中较短的一个。
+        """
+        ttl = self.ttl if timeout is None else min(timeout, self.ttl)
+        if ttl <= 0:
+            self.discard(key)
+            return
+        if not _immutable(value):
+            try:
+                value = _Pickled(pickle_dumps(value, HIGHEST_PROTOCOL))
+            except (PicklingError, TypeError, AttributeError):
+                # 无法序列化的值（比如闭包、锁）只是不在本地缓存。
+                self.discard(key)
+                return
+        with self._lock:
+            self._entries[key] = (monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """
+        命中次数、未命中次数与当前条目数。
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+class _Pickled(bytes):
+    """
+    :class:`NearCache` 中序列化后保存的可变的值。
+    """
+
+
+def _immutable(value: Any) -> bool:
+    match value:
+        case None | bool() | int() | float() | complex() | str() | bytes() | Enum():
+            return True
+        case date() | dtime() | timedelta() | Decimal() | UUID():
+            return True
+        case tuple() | frozenset():
+            return all(_immutable(v) for v in value)
+    return False
+
+
+class CacheLock:
+    """
+    基于缓存后端 ``add()`` 的互斥锁，可以跨进程使用。
+
+    ``add()`` 在 Redis 上是 ``SET NX``，在 LocMemCache 上有进程内的锁保护，因此两者都是原子的。
+    锁会在 ``timeout`` 后自动过期，避免持有者崩溃后死锁。
+
+    释放时只能删除自己持有的锁。Redis 上通过 Lua 脚本原子地比较并删除；其它后端无法原子地比较并删除，
+    因此只在锁确定还没有过期时删除，持有时间接近或超过 ``timeout`` 的锁留给它自行过期，以免删除过期后被别人获取的锁。
+    """
+
+    def __init__(self, target, key: str, timeout: slice | int = 10, wait: float | None = None):
+        """
+        :param target: 缓存后端。
+        :param key: 锁的键。
+        :param timeout: 锁的自动过期时间，可以是秒数，也可以是 ``时:分:秒`` 形式的切片。
+        :param wait: 在上下文中使用时最多等待多少秒，``None`` 表示一直等待。
+        """
+        self.target = target
+        self.key = key
+        self.timeout = _timeout(timeout)
+        self.wait = wait
+        self.token = uuid4().hex
+        self.locked = False
+        self._expires = 0.0
+
+    def __enter__(self) -> bool:
+        return self.acquire(wait=self.wait)
+
+    def __exit__(self, klass, exc, traceback):
+        self.release()
+
+    async def __aenter__(self) -> bool:
+        return await self.aacquire(wait=self.wait)
+
+    async def __aexit__(self, klass, exc, traceback):
+        await self.arelease()
+
+    def acquire(self, blocking=True, wait: float | None = None) -> bool:
+        """
+        获取锁。
+
+        :param blocking: 获取失败时是否等待。
+        :param wait: 最多等待多少秒，``None`` 表示一直等待。
+        :return: 是否获取成功。
+        """
+        deadline = None if wait is None else monotonic() + wait
+        delay = 0.01
+        while not (locked := self._add()):
+            if not blocking or (deadline is not None and monotonic() >= deadline):
+                break
+            sleep(delay)
+            delay = min(delay * 2, 0.2)
+        self.locked = locked
+        return locked
+
+    def _add(self) -> bool:
+        # 在请求发出前计时，得到的过期时间只会比实际的早。
+        self._expires = monotonic() + self.timeout - _LOCK_MARGIN
+        return self.target.add(self.key, self.token, timeout=self.timeout)
+
+    def release(self) -> None:
+        """
+        释放锁。只会删除自己持有的锁，锁过期后被别人获取的情况不受影响。
+        """
+        if not self.locked:
+            return
+        self.locked = False
+        if (redis := _redis(self.target, self.key, self.token)) is not None:
+            client, key, token = redis
+            client.eval(_RELEASE, 1, key, token)
+        elif monotonic() < self._expires and self.target.get(self.key) == self.token:
+            self.target.delete(self.key)
+
+    async def aacquire(self, blocking=True, wait: float | None = None) -> bool:
+        """
+        :meth:`acquire` 的异步版本，等待期间不会阻塞事件循环。
+        """
+        deadline = None if wait is None else monotonic() + wait
+        delay = 0.01
+        while not (locked := await self._aadd()):
+            if not blocking or (deadline is not None and monotonic() >= deadline):
+                break
+            await asleep(delay)
+            delay = min(delay * 2, 0.2)
+        self.locked = locked
+        return locked
+
+    async def _aadd(self) -> bool:
+        self._expires = monotonic() + self.timeout - _LOCK_MARGIN
+        return await self.target.aadd(self.key, self.token, timeout=self.timeout)
+
+    async def arelease(self) -> None:
+        """
+        :meth:`release` 的异步版本。
+        """
+        if not self.locked:
+            return
+        self.locked = False
+        if (redis := _redis(self.target, self.key, self.token)) is not None:
+            client, key, token = redis
+            await sync_to_async(client.eval)(_RELEASE, 1, key, token)
+        elif monotonic() < self._expires and await self.target.aget(self.key) == self.token:
+            await self.target.adelete(self.key)
+
+
+_LOCK_MARGIN = 1
+"""
+锁的过期时间的余量（秒），覆盖后端与本地的时钟误差，以及 Memcached 等后端按整秒计算过期时间的误差。
+"""
+
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _redis(target, key: str, value: Any) -> tuple[Any, Any, Any] | None:
+    """
+    Redis 缓存后端的客户端，以及后端实际使用的键与序列化后的值。其它后端返回 ``None`` 。
+
+    支持 Django 自带的 ``RedisCache`` 与 django-redis 。
+    """
+    module = type(target).__module__
+    if module == 'django.core.cache.backends.redis':
+        key = target.make_and_validate_key(key)
+        return target._cache.get_client(key, write=True), key, target._cache._serializer.dumps(value)
+    if module.startswith('django_redis.'):
+        return target.client.get_client(write=True), target.client.make_key(key), target.client.encode(value)
+    return None
+
+
+class CacheMetrics:
+    """
+    :class:`Cacher` 的埋点统计，只统计当前进程。
+
+    - 按键的前缀（``:`` 分隔的前 ``depth`` 段）统计命中、未命中、写入、删除次数；
+    - 按操作（``get``、``set``、``delete``）统计缓存后端的延迟分布，命中近端缓存的读取不计入；
+    - 按 ``sample_rate`` 抽样统计写入的缓存值序列化后的大小。
+
+    未传给 :class:`Cacher` 时不会产生任何统计开销。
+    """
+
+    BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+    """延迟分布的桶上界，单位是毫秒。"""
+
+    def __init__(self, *, depth: int = 1, sample_rate: float = 0.01):
+        """
+        :param depth: 前缀包含键的前几段。
+        :param sample_rate: 统计缓存值大小的抽样比例，``0`` 表示不统计。
+        """
+        self.depth = depth
+        self.sample_rate = sample_rate
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters: dict[str, Counter] = defaultdict(Counter)
+            self._latency: dict[str, list[int]] = defaultdict(lambda: [0] * (len(self.BUCKETS) + 1))
+            self._elapsed: Counter = Counter()
+
+    def prefix(self, key: str) -> str:
+        return ':'.join(key.split(':', self.depth)[: self.depth])
+
+    def observe(self, operation: str, seconds: float) -> None:
+        ms = seconds * 1000
+        index = next((i for i, bound in enumerate(self.BUCKETS) if ms <= bound), len(self.BUCKETS))
+        with self._lock:
+            self._latency[operation][index] += 1
+            self._elapsed[operation] += ms
+
+    def read(self, keys: Iterable[str], found: Container[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._counters[self.prefix(key)]['hits' if key in found else 'misses'] += 1
+
+    def written(self, dumped: Mapping[str, Any]) -> None:
+        sizes = {}
+        if self.sample_rate > 0:
+            for key, value in dumped.items():
+                if random() < self.sample_rate:
+                    # 配置了 Codec 时缓存值已经是 bytes，否则按缓存后端的做法估算 pickle 后的大小。
+                    sizes[key] = len(value) if isinstance(value, bytes) else len(pickle_dumps(value, HIGHEST_PROTOCOL))
+        with self._lock:
+            for key in dumped:
+                counter = self._counters[self.prefix(key)]
+                counter['sets'] += 1
+                if key in sizes:
+                    counter['sampled'] += 1
+                    counter['sampled_bytes'] += sizes[key]
+                    counter['max_bytes'] = max(counter['max_bytes'], sizes[key])
+
+    def removed(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._counters[self.prefix(key)]['deletes'] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        导出统计数据。
+        """
+        with self._lock:
+            prefixes = {}
+            for prefix, counter in self._counters.items():
+                reads = counter['hits'] + counter['misses']
+                prefixes[prefix] = {
+                    'hits': counter['hits'],
+                    'misses': counter['misses'],
+                    'sets': counter['sets'],
+                    'deletes': counter['deletes'],
+                    'hit_ratio': counter['hits'] / reads if reads else None,
+                    'avg_bytes': counter['sampled_bytes'] // counter['sampled'] if counter['sampled'] else None,
+                    'max_bytes': counter['max_bytes'] if counter['sampled'] else None,
+                }
+            latency = {}
+            for operation, buckets in self._latency.items():
+                bounds = [*(str(bound) for bound in self.BUCKETS), '+Inf']
+                latency[operation] = {
+                    'count': sum(buckets),
+                    'total_ms': self._elapsed[operation],
+                    'buckets': dict(zip(bounds, buckets)),
+                }
+            return {'prefixes': prefixes, 'latency': latency}
 
 
 class Cacher:
-    def __init__(self, name='default'):
+    """
+    缓存的字典式封装。
+
+    - ``cacher[key]``、``cacher[key, default]`` 读取单个键；
+    - ``cacher[key, 0:5] = value`` 写入单个键，超时时间可以是秒数，也可以是 ``时:分:秒`` 形式的切片；
+    - ``cacher[[k1, k2]]``、``cacher[[k1, k2], 0:5] = [v1, v2]``、``del cacher[[k1, k2]]``
+      批量读写，在支持的后端（比如 Redis）上只需要一次往返。
+
+    传入 ``near`` 可以在共享的缓存后端前面加一层进程内的 :class:`NearCache` ；
+    传入 ``codec`` 可以指定缓存值的 :class:`Codec`，否则由缓存后端自行序列化。
+
+    写入时可以通过 ``tags`` 给缓存值打上标签，之后调用 :meth:`invalidate_tags` 让带有这些标签的缓存值全部失效；
+    :meth:`namespace` 返回的子 :class:`Cacher` 会给所有键加上前缀，并可以调用 :meth:`invalidate` 让整个命名空间失效。
+    两者都只需要写入一次版本号，不需要扫描键，代价是读取带标签的缓存值时要多一次往返来核对版本号。
+
+    在异步视图中使用 ``aget()``、``aset()``、``aget_or_set()`` 等以 ``a`` 开头的方法，避免阻塞事件循环。
+
+    传入 ``metrics`` 可以统计命中率、后端延迟与缓存值大小，参见 :class:`CacheMetrics` 与 :attr:`stats`。
+    """
+
+    def __init__(
+        self,
+        name='default',
+        *,
+        near: NearCache | None = None,
+        codec: Codec | None = None,
+        metrics: CacheMetrics | None = None,
+    ):
         self.target = caches[name]
+        self.near = near
+        self.codec = codec
+        self.metrics = metrics
+        self.prefix = ''
+        self.tags: tuple[str, ...] = ()
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """
+        当前进程内的统计数据，未启用的部分为 ``None``。
+        """
+        return {
+            'metrics': None if self.metrics is None else self.metrics.snapshot(),
+            'near': None if self.near is None else self.near.stats,
+            'codec': None if self.codec is None else self.codec.stats,
+        }
 
     def __contains__(self, key: str) -> bool:
-        return self.target.has_key(key)
+        return self._fetch(key) is not _MISSING
 
-    def __getitem__(self, item: str | tuple[str, Any]) -> Any:
+    def __getitem__(self, item: str | tuple[str, Any] | list[str] | tuple[list[str], Any]) -> Any:
         match item:
             case str(key):
-                return self.target.get(key)
-            case [str(key), default]:
-                return self.target.get(key, default=default)
+                return self._get(key)
+            case list(keys):
+                return self.get_many(keys)
+            case (str(key), default):
+                return self._get(key, default)
+            case (list(keys), default):
+                return self.get_many(keys, default=default)
             case _:
                 raise TypeError('无法解析 Cacher.__getitem__() 的参数。')
 
-    def __setitem__(self, item: tuple[str, slice | int], value) -> None:
+    def __setitem__(self, item: tuple[str | list[str], slice | int], value) -> None:
         match item:
-            case [str(key), int(timeout)]:
-                self.target.set(key, value, timeout=timeout)
-            case [str(key), slice() as t]:
-                self.target.set(key, value, timeout=(t.start or 0) * 3600 + (t.stop or 0) * 60 + (t.step or 0))
-            case [str(), t]:
+            case [str(key), int() | slice() as t]:
+                self._set(key, value, _timeout(t))
+            case [list(keys), int() | slice() as t]:
+                if not isinstance(value, Sequence) or isinstance(value, str | bytes):
+                    raise TypeError('Cacher.__setitem__() 批量写入时只接受与 key 一一对应的序列。')
+                if len(keys) != len(value):
+                    raise ValueError(f'Cacher.__setitem__() 提供了 {len(keys)} 个 key，却提供了 {len(value)} 个值。')
+                self.set_many(dict(zip(keys, value)), t)
+            case [str() | list(), t]:
                 raise TypeError(f'Cacher.__setitem__() 不接受 {type(t).__name__} 类型的 timeout 值。')
             case [key, _]:
                 raise TypeError(f'Cacher.__setitem__() 不接受 {type(key).__name__} 类型的 key 值。')
             case _:
                 raise TypeError('无法解析 Cacher.__setitem__() 的参数。')
 
-    def __delitem__(self, key: str) -> None:
-        self.target.delete(key)
+    def __delitem__(self, key: str | list[str]) -> None:
+        match key:
+            case list(keys):
+                self.delete_many(keys)
+            case _:
+                self._remove([self.prefix + key])
+
+    def _dump(self, value: Any) -> Any:
+        if self.codec is None:
+            return value
+        if isinstance(value, _Entry):
+            return _Entry(self.codec.pack(value.value), value.delta, value.expiry, value.tags)
+        return self.codec.pack(value)
+
+    @staticmethod
+    def _load(raw: Any) -> Any:
+        # 无论当前是否配置了 codec，都按值自身的头部解码，方便更换编解码器。
+        if isinstance(raw, _Packed):
+            return Codec.unpack(raw)
+        if isinstance(raw, _Entry) and isinstance(raw.value, _Packed):
+            return _Entry(Codec.unpack(raw.value), raw.delta, raw.expiry, raw.tags)
+        return raw
+
+    # 以下几个方法是与缓存后端、近端缓存打交道的唯一入口，接受的都是加上了前缀的完整的键。
+
+    def _read(self, keys: list[str]) -> dict[str, Any]:
+        found = {}
+        if self.near is not None:
+            for key in keys:
+                if self.near.accepts(key) and (raw := self.near.lookup(key)) is not _MISSING:
+                    found[key] = raw
+        if remote := [key for key in keys if key not in found]:
+            start = perf_counter()
+            if len(remote) == 1:
+                raw = self.target.get(remote[0], _MISSING)
+                fetched = {} if raw is _MISSING else {remote[0]: self._load(raw)}
+            else:
+                fetched = {k: self._load(v) for k, v in self.target.get_many(remote).items()}
+            if self.metrics is not None:
+                self.metrics.observe('get', perf_counter() - start)
+            if self.near is not None:
+                for key, raw in fetched.items():
+                    if self.near.accepts(key):
+                        self.near.store(key, raw)
+            found.update(fetched)
+        if tagged := _tagged_entries(found):
+            versions = self.target.get_many(_version_keys(tagged))
+            self._evict(found, _outdated(tagged, versions))
+        if self.metrics is not None:
+            self.metrics.read(keys, found)
+        return found
+
+    def _write(self, mapping: dict[str, Any], timeout: int, versions: dict[str, str]) -> list[str]:
+        if versions:
+            mapping = {k: _tag(v, timeout, versions) for k, v in mapping.items()}
+        dumped = {k: self._dump(v) for k, v in mapping.items()}
+        start = perf_counter()
+        if len(dumped) == 1:
+            [(key, value)] = dumped.items()
+            self.target.set(key, value, timeout=timeout)
+            failed = []
+        else:
+            failed = self.target.set_many(dumped, timeout=timeout)
+        if self.metrics is not None:
+            self.metrics.observe('set', perf_counter() - start)
+            self.metrics.written(dumped)
+        if self.near is not None:
+            for key, value in mapping.items():
+                if self.near.accepts(key) and key not in failed:
+                    self.near.store(key, value, timeout)
+        return failed
+
+    def _remove(self, keys: list[str]) -> None:
+        if self.near is not None:
+            for key in keys:
+                self.near.discard(key)
+        start = perf_counter()
+        if len(keys) == 1:
+            self.target.delete(keys[0])
+        elif keys:
+            self.target.delete_many(keys)
+        if self.metrics is not None:
+            self.metrics.observe('delete', perf_counter() - start)
+            self.metrics.removed(keys)
+
+    def _evict(self, found: dict[str, Any], keys: Iterable[str]) -> None:
+        for key in keys:
+            del found[key]
+            if self.near is not None:
+                self.near.discard(key)
+
+    def _versions(self, tags: Iterable[str]) -> dict[str, str]:
+        """
+        读取标签当前的版本号，不存在的标签会被初始化。
+        """
+        if not (tags := {*self.tags, *tags}):
+            return {}
+        found = self.target.get_many([_TAG + tag for tag in tags])
+        versions = {}
+        for tag in tags:
+            if (version := found.get(_TAG + tag)) is None:
+                version = uuid4().hex
+                if not self.target.add(_TAG + tag, version, timeout=None):
+                    version = self.target.get(_TAG + tag)
+            versions[tag] = version
+        return versions
+
+    def _fetch(self, key: str) -> Any:
+        key = self.prefix + key
+        return self._read([key]).get(key, _MISSING)
+
+    def _get(self, key: str, default: Any = None) -> Any:
+        raw = self._fetch(key)
+        return default if raw is _MISSING else _unwrap(raw)
+
+    def _set(self, key: str, value: Any, timeout: int, tags: Iterable[str] = ()) -> None:
+        self._write({self.prefix + key: value}, timeout, self._versions(tags))
+
+    def set(self, key: str, value: Any, timeout: slice | int, *, tags: Iterable[str] = ()) -> None:
+        """
+        写入单个键，即 ``cacher[key, timeout] = value``，但可以给缓存值打上标签。
+
+        :param key: 缓存的键。
+        :param value: 缓存值。
+        :param timeout: 超时时间，可以是秒数，也可以是 ``时:分:秒`` 形式的切片。
+        :param tags: 缓存值的标签。
+        """
+        self._set(key, value, _timeout(timeout), tags)
+
+    def get_many(self, keys: Iterable[str], default: Any = None) -> dict[str, Any]:
+        """
+        批量读取。
+
+        :param keys: 要读取的键。
+        :param default: 缓存中不存在的键的默认值。
+        :return: 一个包含所有 ``keys`` 的字典，顺序与 ``keys`` 相同。
+        """
+        keys = list(keys)
+        found = self._read([self.prefix + key for key in keys])
+        return {key: _unwrap(found[k]) if (k := self.prefix + key) in found else default for key in keys}
+
+    def set_many(self, mapping: Mapping[str, Any], timeout: slice | int, *, tags: Iterable[str] = ()) -> list[str]:
+        """
+        批量写入。
+
+        :param mapping: 要写入的键值对。
+        :param timeout: 超时时间，可以是秒数，也可以是 ``时:分:秒`` 形式的切片。
+        :param tags: 所有缓存值共同的标签。
+        :return: 写入失败的键。
+        """
+        if not mapping:
+            return []
+        mapping = {self.prefix + key: value for key, value in mapping.items()}
+        failed = self._write(mapping, _timeout(timeout), self._versions(tags))
+        return [key.removeprefix(self.prefix) for key in failed]
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        """
+        批量删除。
+
+        :param keys: 要删除的键。
+        """
+        self._remove([self.prefix + key for key in keys])
+
+    def namespace(self, name: str) -> 'Cacher':
+        """
+        获取一个命名空间。
+
+        命名空间与当前 :class:`Cacher` 共享缓存后端、近端缓存与编解码器，但所有键都会自动加上 ``name:`` 前缀，
+        并且可以通过 :meth:`invalidate` 整体失效。命名空间可以嵌套，外层失效时内层也会失效。
+
+        :param name: 命名空间的名称。
+        :return: 一个新的 :class:`Cacher` 。
+        """
+        space = copy(self)
+        space.prefix = f'{self.prefix}{name}:'
+        space.tags = (*self.tags, space.prefix)
+        return space
+
+    def invalidate(self) -> None:
+        """
+        让当前命名空间内的所有缓存值失效。
+        """
+        assert self.prefix, '只能让 Cacher.namespace() 返回的命名空间整体失效。'
+        self.invalidate_tags(self.prefix)
+
+    def invalidate_tags(self, *tags: str) -> None:
+        """
+        让带有任意一个 ``tags`` 的缓存值失效。
+        """
+        if tags:
+            self.target.set_many({_TAG + tag: uuid4().hex for tag in tags}, timeout=None)
+
+    def lock(self, key: str, timeout: slice | int = 10, wait: float | None = None) -> CacheLock:
+        """
+        获取 ``key`` 对应的跨进程互斥锁，参见 :class:`CacheLock` 。
+        """
+        return CacheLock(self.target, f'{self.prefix}{key}:lock', timeout, wait)
+
+    def get_or_set(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        timeout: slice | int,
+        *,
+        tags: Iterable[str] = (),
+        beta: float = 1.0,
+        wait: float = 5.0,
+        lock_timeout: slice | int = 10,
+    ) -> Any:
+        """
+        读取缓存，不存在时调用 ``compute()`` 计算并写入。
+
+        - 同一时间只有一个 worker 会调用 ``compute()``，其余 worker 等待它写入，最多等待 ``wait`` 秒，
+          超时后自行计算（宁可多算一次，也不让请求失败）。
+        - 按 `XFetch <https://cseweb.ucsd.edu/~avattani/papers/cache_stampede.pdf>`_ 算法在过期前提前重算，
+          重算期间其它 worker 直接返回旧值，从而把集中过期分散开。
+
+        :param key: 缓存的键。
+        :param compute: 计算缓存值的函数。
+        :param timeout: 超时时间，可以是秒数，也可以是 ``时:分:秒`` 形式的切片。
+        :param tags: 缓存值的标签。
+        :param beta: 提前重算的倾向，越大越早重算，``0`` 表示不提前重算。
+        :param wait: 等待其它 worker 计算的最长秒数。
+        :param lock_timeout: 重算锁的自动过期时间，应当长于 ``compute()`` 的耗时。
+        :return: 缓存值。
+        """
+        timeout = _timeout(timeout)
+        lock = self.lock(key, lock_timeout)
+        raw = self._fetch(key)
+
+        if raw is not _MISSING:
+            if not isinstance(raw, _Entry) or not raw.due(beta):
+                return _unwrap(raw)
+            # 抢不到锁说明已经有其它 worker 在重算，先返回旧值。
+            if not lock.acquire(blocking=False):
+                return raw.value
+            try:
+                return self._compute(key, compute, timeout, tags)
+            finally:
+                lock.release()
+
+        deadline = monotonic() + wait
+        delay = 0.01
+        while not lock.acquire(blocking=False):
+            if (raw := self._fetch(key)) is not _MISSING:
+                return _unwrap(raw)
+            if monotonic() >= deadline:
+                return self._compute(key, compute, timeout, tags)
+            sleep(delay)
+            delay = min(delay * 2, 0.2)
+        try:
+            # 等锁期间其它 worker 可能已经写入了。
+            if (raw := self._fetch(key)) is not _MISSING:
+                return _unwrap(raw)
+            return self._compute(key, compute, timeout, tags)
+        finally:
+            lock.release()
+
+    def _compute(self, key: str, compute: Callable[[], Any], timeout: int, tags: Iterable[str]) -> Any:
+        # 先读版本号再计算，计算期间发生的失效会让这次写入的值立即过时，而不是被掩盖。
+        versions = self._versions(tags)
+        start = monotonic()
+        value = compute()
+        self._write({self.prefix + key: _Entry(value, monotonic() - start, time() + timeout)}, timeout, versions)
+        return value
+
+    def memoize(self, key: str, timeout: slice | int, **options):
+        """
+        :meth:`get_or_set` 的装饰器形式。参数不参与构造缓存的键，所有调用共享同一个 ``key``。
+
+        装饰 ``async def`` 函数时使用 :meth:`aget_or_set` 。
+
+        :param key: 缓存的键。
+        :param timeout: 超时时间，可以是秒数，也可以是 ``时:分:秒`` 形式的切片。
+        :param options: 传递给 :meth:`get_or_set` 的其它参数。
+        """
+
+        def decorator(func):
+            if iscoroutinefunction(func):
+
+                @wraps(func)
+                async def wrapper(*args, **kwargs):
+                    return await self.aget_or_set(key, lambda: func(*args, **kwargs), timeout, **options)
+
+            else:
+
+                @wraps(func)
+                def wrapper(*args, **kwargs):
+                    return self.get_or_set(key, lambda: func(*args, **kwargs), timeout, **options)
+
+            return wrapper
+
+        return decorator
+
+    async def _aread(self, keys: list[str]) -> dict[str, Any]:
+        found = {}
+        if self.near is not None:
+            for key in keys:
+                if self.near.accepts(key) and (raw := self.near.lookup(key)) is not _MISSING:
+                    found[key] = raw
+        if remote := [key for key in keys if key not in found]:
+            start = perf_counter()
+            if len(remote) == 1:
+                raw = await self.target.aget(remote[0], _MISSING)
+                fetched = {} if raw is _MISSING else {remote[0]: self._load(raw)}
+            else:
+                fetched = {k: self._load(v) for k, v in (await self.target.aget_many(remote)).items()}
+            if self.metrics is not None:
+                self.metrics.observe('get', perf_counter() - start)
+            if self.near is not None:
+                for key, raw in fetched.items():
+                    if self.near.accepts(key):
+                        self.near.store(key, raw)
+            found.update(fetched)
+        if tagged := _tagged_entries(found):
+            versions = await self.target.aget_many(_version_keys(tagged))
+            self._evict(found, _outdated(tagged, versions))
+        if self.metrics is not None:
+            self.metrics.read(keys, found)
+        return found
+
+    async def _awrite(self, mapping: dict[str, Any], timeout: int, versions: dict[str, str]) -> list[str]:
+        if versions:
+            mapping = {k: _tag(v, timeout, versions) for k, v in mapping.items()}
+        dumped = {k: self._dump(v) for k, v in mapping.items()}
+        start = perf_counter()
+        if len(dumped) == 1:
+            [(key, value)] = dumped.items()
+            await self.target.aset(key, value, timeout=timeout)
+            failed = []
+        else:
+            failed = await self.target.aset_many(dumped, timeout=timeout)
+        if self.metrics is not None:
+            self.metrics.observe('set', perf_counter() - start)
+            self.metrics.written(dumped)
+        if self.near is not None:
+            for key, value in mapping.items():
+                if self.near.accepts(key) and key not in failed:
+                    self.near.store(key, value, timeout)
+        return failed
+
+    async def _aremove(self, keys: list[str]) -> None:
+        if self.near is not None:
+            for key in keys:
+                self.near.discard(key)
+        start = perf_counter()
+        if len(keys) == 1:
+            await self.target.adelete(keys[0])
+        elif keys:
+            await self.target.adelete_many(keys)
+        if self.metrics is not None:
+            self.metrics.observe('delete', perf_counter() - start)
+            self.metrics.removed(keys)
+
+    async def _aversions(self, tags: Iterable[str]) -> dict[str, str]:
+        if not (tags := {*self.tags, *tags}):
+            return {}
+        found = await self.target.aget_many([_TAG + tag for tag in tags])
+        versions = {}
+        for tag in tags:
+            if (version := found.get(_TAG + tag)) is None:
+                version = uuid4().hex
+                if not await self.target.aadd(_TAG + tag, version, timeout=None):
+                    version = await self.target.aget(_TAG + tag)
+            versions[tag] = version
+        return versions
+
+    async def _afetch(self, key: str) -> Any:
+        key = self.prefix + key
+        return (await self._aread([key])).get(key, _MISSING)
+
+    async def acontains(self, key: str) -> bool:
+        """
+        ``key in cacher`` 的异步版本。
+        """
+        return await self._afetch(key) is not _MISSING
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        """
+        ``cacher[key, default]`` 的异步版本。
+        """
+        raw = await self._afetch(key)
+        return default if raw is _MISSING else _unwrap(raw)
+
+    async def aset(self, key: str, value: Any, timeout: slice | int, *, tags: Iterable[str] = ()) -> None:
+        """
+        :meth:`set` 的异步版本。
+        """
+        await self._awrite({self.prefix + key: value}, _timeout(timeout), await self._aversions(tags))
+
+    async def adelete(self, key: str) -> None:
+        """
+        ``del cacher[key]`` 的异步版本。
+        """
+        await self._aremove([self.prefix + key])
+
+    async def aget_many(self, keys: Iterable[str], default: Any = None) -> dict[str, Any]:
+        """
+        :meth:`get_many` 的异步版本。
+        """
+        keys = list(keys)
+        found = await self._aread([self.prefix + key for key in keys])
+        return {key: _unwrap(found[k]) if (k := self.prefix + key) in found else default for key in keys}
+
+    async def aset_many(
+        self,
+        mapping: Mapping[str, Any],
+        timeout: slice | int,
+        *,
+        tags: Iterable[str] = (),
+    ) -> list[str]:
+        """
+        :meth:`set_many` 的异步版本。
+        """
+        if not mapping:
+            return []
+        mapping = {self.prefix + key: value for key, value in mapping.items()}
+        failed = await self._awrite(mapping, _timeout(timeout), await self._aversions(tags))
+        return [key.removeprefix(self.prefix) for key in failed]
+
+    async def adelete_many(self, keys: Iterable[str]) -> None:
+        """
+        :meth:`delete_many` 的异步版本。
+        """
+        await self._aremove([self.prefix + key for key in keys])
+
+    async def ainvalidate(self) -> None:
+        """
+        :meth:`invalidate` 的异步版本。
+        """
+        assert self.prefix, '只能让 Cacher.namespace() 返回的命名空间整体失效。'
+        await self.ainvalidate_tags(self.prefix)
+
+    async def ainvalidate_tags(self, *tags: str) -> None:
+        """
+        :meth:`invalidate_tags` 的异步版本。
+        """
+        if tags:
+            await self.target.aset_many({_TAG + tag: uuid4().hex for tag in tags}, timeout=None)
+
+    async def aget_or_set(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        timeout: slice | int,
+        *,
+        tags: Iterable[str] = (),
+        beta: float = 1.0,
+        wait: float = 5.0,
+        lock_timeout: slice | int = 10,
+    ) -> Any:
+        """
+        :meth:`get_or_set` 的异步版本，``compute()`` 需要返回一个可等待对象，等待期间不会阻塞事件循环。
+        """
+        timeout = _timeout(timeout)
+        lock = self.lock(key, lock_timeout)
+        raw = await self._afetch(key)
+
+        if raw is not _MISSING:
+            if not isinstance(raw, _Entry) or not raw.due(beta):
+                return _unwrap(raw)
+            if not await lock.aacquire(blocking=False):
+                return raw.value
+            try:
+                return await self._acompute(key, compute, timeout, tags)
+            finally:
+                await lock.arelease()
+
+        deadline = monotonic() + wait
+        delay = 0.01
+        while not await lock.aacquire(blocking=False):
+            if (raw := await self._afetch(key)) is not _MISSING:
+                return _unwrap(raw)
+            if monotonic() >= deadline:
+                return await self._acompute(key, compute, timeout, tags)
+            await asleep(delay)
+            delay = min(delay * 2, 0.2)
+        try:
+            if (raw := await self._afetch(key)) is not _MISSING:
+                return _unwrap(raw)
+            return await self._acompute(key, compute, timeout, tags)
+        finally:
+            await lock.arelease()
+
+    async def _acompute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        timeout: int,
+        tags: Iterable[str],
+    ) -> Any:
+        versions = await self._aversions(tags)
+        start = monotonic()
+        value = await compute()
+        entry = _Entry(value, monotonic() - start, time() + timeout)
+        await self._awrite({self.prefix + key: entry}, timeout, versions)
+        return value
+
+
+cacher = Cacher(metrics=CacheMetrics() if getattr(settings, 'CACHER_METRICS', False) else None)
+
+
+def model_tag(model: Model | type[Model]) -> str:
+    """
+    模型或模型实例的缓存标签，形如 ``core.user`` 或 ``core.user:42`` 。
+
+    ``apps.core`` 的模型在保存和删除后会让对应的两个标签失效。
+    """
+    if isinstance(model, Model):
+        return f'{model._meta.label_lower}:{model.pk}'
+    return model._meta.label_lower
+
+
+def _models(value: Any) -> Iterator[Model]:
+    match value:
+        case Model():
+            yield value
+        case QueryDict() | str() | bytes():
+            pass
+        case Mapping():
+            for v in value.values():
+                yield from _models(v)
+        case list() | tuple() | set() | frozenset():
+            for v in value:
+                yield from _models(v)
+
+
+def _normalize(value: Any) -> Any:
+    """
+    将参数转换为可以稳定 ``repr()`` 的形式，用于构造缓存的键。
+    """
+    match value:
+        case None | bool() | int() | float() | str() | bytes():
+            return value
+        case Enum():
+            return type(value).__qualname__, value.value
+        case date() | datetime() | dtime() | timedelta() | Decimal() | UUID():
+            return value
+        case Model():
+            return value._meta.label_lower, value.pk
+        case QueryDict():
+            return tuple(sorted((k, tuple(v)) for k, v in value.lists()))
+        case Mapping():
+            return tuple(sorted(((_normalize(k), _normalize(v)) for k, v in value.items()), key=repr))
+        case list() | tuple():
+            return tuple(_normalize(v) for v in value)
+        case set() | frozenset():
+            return tuple(sorted((_normalize(v) for v in value), key=repr))
+        case _:
+            raise TypeError(f'无法为 {type(value).__name__} 类型的参数构造缓存的键。')
+
+
+def cached(
+    timeout: slice | int,
+    *,
+    using: Cacher | None = None,
+    prefix: str | None = None,
+    exclude: Iterable[str] = ('self', 'cls'),
+    **options,
+):
+    """
+    根据函数参数缓存函数的返回值。
+
+    缓存的键由函数的完整名称与参数构造，参数支持基本类型、枚举、日期时间、``Decimal``、``UUID``、
+    模型实例（按主键）、``QueryDict`` 以及由它们组成的容器，其它类型会抛出 :class:`TypeError`，
+    需要通过 ``exclude`` 排除。被装饰的函数多出几个属性：
+
+    - ``func.key(*args, **kwargs)`` 返回对应参数的缓存键；
+    - ``func.invalidate(*args, **kwargs)`` 删除对应参数的缓存，异步版本为 ``func.ainvalidate()``；
+    - ``func.invalidate_all()`` 让这个函数的所有缓存失效，异步版本为 ``func.ainvalidate_all()``。
+
+    参数中的模型实例会成为缓存值的标签（参见 :func:`model_tag`），实例保存或删除后相应的缓存随之失效。
+
+    同步函数通过 :meth:`Cacher.get_or_set` 防止缓存击穿，``async def`` 函数则通过 :meth:`Cacher.aget_or_set` 。
+
+    >>> class UserViewSet(MeowViewSet):
+    ...     @cached(slice(0, 5), exclude=('self', 'request'))
+    ...     def stats(self, request, user: User) -> dict: ...
+
+    :param timeout: 超时时间，可以是秒数，也可以是 ``时:分:秒`` 形式的切片。
+    :param using: 使用的 :class:`Cacher`，默认为 ``cacher``。
+    :param prefix: 缓存键的前缀，默认为函数的完整名称。
+    :param exclude: 不参与构造缓存键的参数名。
+    :param options: 传递给 :meth:`Cacher.get_or_set` 的其它参数。
+    """
+    exclude = frozenset(exclude)
+
+    def decorator(func):
+        sign = signature(func)
+        base = prefix or f'{func.__module__}.{func.__qualname__}'
+        target = using or cacher
+
+        def bind(args, kwargs) -> tuple[str, list[str]]:
+            bound = sign.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {k: v for k, v in bound.arguments.items() if k not in exclude}
+            normalized = tuple((k, _normalize(v)) for k, v in arguments.items())
+            tags = [base, *(model_tag(m) for m in _models(list(arguments.values())))]
+            return f'{base}:{blake2b(repr(normalized).encode(), digest_size=16).hexdigest()}', tags
+
+        def key(*args, **kwargs) -> str:
+            return bind(args, kwargs)[0]
+
+        if iscoroutinefunction(func):
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                k, tags = bind(args, kwargs)
+                return await target.aget_or_set(k, lambda: func(*args, **kwargs), timeout, tags=tags, **options)
+
+        else:
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                k, tags = bind(args, kwargs)
+                return target.get_or_set(k, lambda: func(*args, **kwargs), timeout, tags=tags, **options)
+
+        def invalidate(*args, **kwargs) -> None:
+            del target[key(*args, **kwargs)]
+
+        async def ainvalidate(*args, **kwargs) -> None:
+            await target.adelete(key(*args, **kwargs))
+
+        def invalidate_all() -> None:
+            target.invalidate_tags(base)
+
+        async def ainvalidate_all() -> None:
+            await target.ainvalidate_tags(base)
 
+        wrapper.key = key
+        wrapper.invalidate = invalidate
+        wrapper.ainvalidate = ainvalidate
+        wrapper.invalidate_all = invalidate_all
+        wrapper.ainvalidate_all = ainvalidate_all
+        return wrapper
 
-cacher = Cacher()
+    return decorator
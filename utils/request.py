@@ -1,12 +1,272 @@
+import json
+import re
+import sys
 from abc import ABC, abstractmethod
-from typing import Literal
+from asyncio import (
+    AbstractEventLoop,
+    CancelledError,
+    Future as AsyncFuture,
+    Semaphore as AsyncSemaphore,
+    ensure_future,
+    get_running_loop,
+    shield,
+    sleep as asleep,
+    wait as async_wait,
+)
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from datetime import timedelta
+from hashlib import blake2b
+from http.cookiejar import DefaultCookiePolicy
+from logging import INFO, Logger
+from os import getpid
+from random import random, uniform
+from threading import BoundedSemaphore, Lock
+from time import monotonic, sleep, time
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, ClassVar, Literal, TypeVar
+from urllib.parse import urlencode
+from weakref import WeakKeyDictionary
 
 import requests
-from django.http import QueryDict
+from asgiref.sync import sync_to_async
+from django.http import QueryDict, StreamingHttpResponse
 from django.views import View
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.retry import Retry
 
+from commons.exceptions import MeowViewException
+from commons.response import Errcode
+from utils.cache import Cacher, cacher
 from utils.http import HTTPMethod
 
+if TYPE_CHECKING:
+    import httpx
+
+R = TypeVar('R')
+
+# 异常信息中 URL 的查询参数，比如 "Max retries exceeded with url: /sns/jscode2session?appid=...&secret=..." 。
+_QUERY = re.compile(r"""\?[^\s'"()<>]+""")
+
+
+class RetryPolicy:
+    """
+    外部服务请求的重试策略。
+
+    - 只有幂等的请求才会在网络错误或特定的 HTTP 状态码后重试；连接失败时请求尚未发出，任何请求都可以重试；
+    - 响应中带有特定的业务错误码（比如“请求过快”）时，说明请求被上游拒绝，任何请求都可以重试；
+    - 两次尝试之间按指数退避等待一个随机时长（full jitter），避免大量 worker 同时重试。
+    """
+
+    IDEMPOTENT = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'})
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        *,
+        backoff: float = 0.1,
+        cap: float = 2.0,
+        methods: Iterable[str] = IDEMPOTENT,
+        statuses: Iterable[int] = (429, 502, 503, 504),
+        errcodes: Iterable[int] = (),
+    ):
+        """
+        :param attempts: 最多尝试多少次（含第一次）。
+        :param backoff: 退避的基数秒数，第 n 次重试前最多等待 ``backoff * 2 ** (n - 1)`` 秒。
+        :param cap: 单次等待的最大秒数。
+        :param methods: 可以在网络错误或 ``statuses`` 后重试的 HTTP 方法。
+        :param statuses: 需要重试的 HTTP 状态码。
+        :param errcodes: 需要重试的业务错误码，由 :meth:`ServiceRequest._errcode` 从响应中取出。
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.cap = cap
+        self.methods = frozenset(methods)
+        self.statuses = frozenset(statuses)
+        self.errcodes = frozenset(errcodes)
+
+    def delay(self, attempt: int) -> float:
+        """
+        第 ``attempt`` 次（从 1 开始）重试前需要等待的秒数。
+        """
+        return uniform(0, min(self.cap, self.backoff * 2 ** (attempt - 1)))
+
+    def on_error(self, method: str, error: Exception) -> bool:
+        """
+        请求出现网络错误后是否可以重试。
+        """
+        return method in self.methods or _connect_failed(error)
+
+    def on_status(self, method: str, status: int) -> bool:
+        """
+        请求得到 HTTP 响应后是否需要重试。
+        """
+        return status in self.statuses and method in self.methods
+
+
+def _connect_failed(error: Exception) -> bool:
+    # 未导入 httpx 时，也就不可能出现 httpx 的异常。
+    if isinstance(error, requests.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], 'reason', None), ConnectTimeoutError)
+    httpx = sys.modules.get('httpx')
+    return httpx is not None and isinstance(error, httpx.ConnectError | httpx.ConnectTimeout)
+
+
+class CircuitBreaker:
+    """
+    熔断器。上游连续失败达到阈值后“断开”，在冷却期内直接拒绝请求，避免所有 worker 都阻塞在不可用的上游上；
+    冷却期过后只放行一个探测请求，成功则恢复，失败则继续冷却。
+
+    状态只保存在当前进程中。
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30):
+        """
+        :param threshold: 连续失败多少次后断开。
+        :param cooldown: 断开后冷却多少秒。
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+        self._lock = Lock()
+
+    @property
+    def state(self) -> Literal['closed', 'open', 'half-open']:
+        if self.opened_at is None:
+            return 'closed'
+        if self.probing or monotonic() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def check(self) -> bool:
+        """
+        请求前检查熔断器，断开时抛出错误码为 ``Errcode.DEPENDENCE_UNAVAILABLE`` 的 :class:`MeowViewException` 。
+
+        :return: 当前请求是否为探测请求。探测请求结束时必须调用 :meth:`succeed`、:meth:`fail` 或 :meth:`abandon` 之一。
+        """
+        if self.opened_at is None:
+            return False
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            if not self.probing and monotonic() - self.opened_at >= self.cooldown:
+                self.probing = True
+                return True
+        raise MeowViewException(code=Errcode.DEPENDENCE_UNAVAILABLE)
+
+    def succeed(self) -> None:
+        """
+        记录一次成功的请求。
+        """
+        if self.failures or self.opened_at is not None:
+            with self._lock:
+                self.failures = 0
+                self.opened_at = None
+                self.probing = False
+
+    def fail(self) -> None:
+        """
+        记录一次失败的请求。
+        """
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = monotonic()
+                self.probing = False
+
+    def abandon(self) -> None:
+        """
+        探测请求既没有成功也没有失败（比如被限流或被取消）时放弃这次探测，让下一个请求重新探测。
+        已经记录了结果时不做任何事。
+        """
+        if self.probing:
+            with self._lock:
+                self.probing = False
+
+
+class RateLimiter:
+    """
+    客户端限流器，按滑动窗口估算最近 ``per`` 秒内发出的请求数，超出 ``rate`` 时等待或直接失败。
+
+    计数保存在缓存后端中（``add()`` 与 ``incr()`` 在 Redis 上是原子的），因此所有 worker 进程共用同一份配额。
+    估算值为当前窗口的计数，加上前一个窗口的计数乘以它与滑动窗口重叠的比例。
+    """
+
+    def __init__(self, name: str, rate: int, per: float = 1, *, wait: float = 0, using: Cacher | None = None):
+        """
+        :param name: 配额的名称，同名的限流器共用配额。
+        :param rate: 每 ``per`` 秒最多发出多少个请求。
+        :param per: 窗口的秒数。
+        :param wait: 配额耗尽时最多等待多少秒，``0`` 表示直接失败。
+        :param using: 保存计数的 :class:`Cacher` ，默认为 ``cacher`` 。
+        """
+        self.name = name
+        self.rate = rate
+        self.per = per
+        self.wait = wait
+        self.cacher = using or cacher
+
+    def _keys(self, now: float) -> tuple[str, str, float]:
+        window, elapsed = divmod(now / self.per, 1)
+        prefix = f'{self.cacher.prefix}ratelimit:{self.name}'
+        return f'{prefix}:{int(window)}', f'{prefix}:{int(window) - 1}', elapsed
+
+    def _timeout(self) -> int:
+        # 当前窗口的计数在下一个窗口里还要用到。
+        return int(self.per * 2) + 1
+
+    def _estimate(self, current: int, previous: int | None, elapsed: float) -> float:
+        return current + (previous or 0) * (1 - elapsed)
+
+    def _delay(self, deadline: float) -> float:
+        # 窗口滑动时配额逐渐恢复，因此按窗口的一小段时间轮询。
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            raise MeowViewException(code=Errcode.DEPENDENCE_UNAVAILABLE)
+        return min(remaining, self.per / 10)
+
+    def acquire(self) -> None:
+        """
+        占用一个请求的配额。等待超过 :attr:`wait` 秒后，抛出错误码为 ``Errcode.DEPENDENCE_UNAVAILABLE`` 的
+        :class:`MeowViewException` 。
+        """
+        target = self.cacher.target
+        deadline = monotonic() + self.wait
+        while True:
+            current_key, previous_key, elapsed = self._keys(time())
+            try:
+                current = target.incr(current_key)
+            except ValueError:
+                current = 1 if target.add(current_key, 1, self._timeout()) else target.incr(current_key)
+            if self._estimate(current, target.get(previous_key), elapsed) <= self.rate:
+                return
+            target.decr(current_key)
+            sleep(self._delay(deadline))
+
+    async def aacquire(self) -> None:
+        """
+        :meth:`acquire` 的异步版本，等待期间不会阻塞事件循环。
+        """
+        target = self.cacher.target
+        # Django 缓存后端默认的 aincr() 与 adecr() 是先读后写，并非原子操作。
+        incr, decr = sync_to_async(target.incr), sync_to_async(target.decr)
+        deadline = monotonic() + self.wait
+        while True:
+            current_key, previous_key, elapsed = self._keys(time())
+            try:
+                current = await incr(current_key)
+            except ValueError:
+                current = 1 if await target.aadd(current_key, 1, self._timeout()) else await incr(current_key)
+            if self._estimate(current, await target.aget(previous_key), elapsed) <= self.rate:
+                return
+            await decr(current_key)
+            await asleep(self._delay(deadline))
+
 
 class ServiceRequest(ABC):
     """
@@ -16,11 +276,110 @@ class ServiceRequest(ABC):
     endpoint: str = ''
     """API 地址根部，不应以 ``/`` 结尾。"""
 
+    pool_maxsize: int = 10
+    """连接池中最多保持多少个连接，一般不小于 worker 进程的线程数。"""
+
+    pool_block: bool = False
+    """连接池耗尽时是否等待空闲连接，否则临时创建一个用完即弃的连接。"""
+
+    keep_alive: bool = True
+    """是否复用连接。"""
+
+    timeout: float | tuple[float, float] | None = None
+    """默认的超时秒数，可以是一个数，也可以是（连接超时，读取超时）。"""
+
+    retries: int = 0
+    """
+    连接失败时在连接池层面立即重试的次数。此时请求尚未发出，任何请求都可以重试；
+    读取失败的请求可能已经被上游处理，是否重试由 :attr:`retry` 决定。需要退避或按业务错误码重试时，也应使用 :attr:`retry` 。
+    """
+
+    retry: RetryPolicy | None = None
+    """重试策略，``None`` 表示不重试。"""
+
+    retry_policies: ClassVar[Mapping[str, RetryPolicy | None]] = MappingProxyType({})
+    """
+    按 API 路径区分的重试策略，覆盖 :attr:`retry` ，比如不能重复提交的 API 只在连接失败时重试。
+
+    与 :attr:`limiters` 一样，子类需要赋值一个新的字典，而不是修改继承来的映射。
+    """
+
+    breaker: CircuitBreaker | None = None
+    """熔断器，``None`` 表示不熔断。熔断器是类属性，因此会被没有另行设置的子类共用。"""
+
+    limiter: RateLimiter | None = None
+    """整个服务的限流器，``None`` 表示不限流。"""
+
+    limiters: ClassVar[Mapping[str, RateLimiter]] = MappingProxyType({})
+    """
+    按 API 路径区分的限流器，与 :attr:`limiter` 同时生效。
+
+    默认值是所有服务共用的只读映射，子类需要赋值一个新的字典，比如 ``limiters = {'/cgi-bin/token': RateLimiter(...)}`` ，
+    而不是修改继承来的映射，否则会限制到其它服务的同名路径。
+    """
+
+    max_body: int | None = None
+    """流式读取时响应体最多多少字节，超过时抛出错误码为 ``Errcode.DEPENDENCE_ERROR`` 的异常；``None`` 表示不限制。"""
+
+    coalesce: bool = False
+    """是否合并同一进程内同时发出的相同幂等请求，只有第一个请求真正发出，其余请求共用它的响应。"""
+
+    coalesce_ttl: int = 0
+    """
+    大于 0 时，还通过缓存跨进程合并相同的请求：只有一个进程发出请求，成功的响应在缓存中保留这么多秒。
+
+    缓存中只保存响应的状态码、响应头与响应体。带有 :attr:`redacted` 中的查询参数或请求头（比如密钥）的请求不会跨进程合并。
+    """
+
+    concurrency: int | None = None
+    """通过 :func:`fanout` 或 :func:`afanout` 并发请求时，同一进程内最多同时向当前服务发出多少个请求。"""
+
+    label: str = '外部服务'
+    """日志中的服务名称。"""
+
+    log_rate: float = 1.0
+    """请求与响应日志的抽样比例，``0.1`` 表示只记录十分之一的请求。错误日志不受影响。"""
+
+    log_limit: int = 1024
+    """日志中的响应体最多保留多少个字符。"""
+
+    redacted: frozenset[str] = frozenset(
+        {'access_token', 'authorization', 'cookie', 'js_code', 'password', 'secret', 'session_key', 'set-cookie'}
+    )
+    """日志中需要隐去值的请求头、查询参数与请求体、响应体的字段，不区分大小写。"""
+
+    _sessions: ClassVar[dict[tuple[type, int], requests.Session]] = {}
+    _sessions_lock: ClassVar[Lock] = Lock()
+    _clients: ClassVar[WeakKeyDictionary[AbstractEventLoop, dict[type, 'httpx.AsyncClient']]] = WeakKeyDictionary()
+    _semaphores: ClassVar[dict[tuple[type, int], BoundedSemaphore]] = {}
+    _async_semaphores: ClassVar[WeakKeyDictionary[AbstractEventLoop, dict[type, AsyncSemaphore]]] = WeakKeyDictionary()
+    _templates: ClassVar[dict[tuple[str, Any, str], tuple[str, str]]] = {}
+    _inflight: ClassVar[dict[str, Future]] = {}
+    _inflight_lock: ClassVar[Lock] = Lock()
+    _ainflight: ClassVar[WeakKeyDictionary[AbstractEventLoop, dict[str, AsyncFuture]]] = WeakKeyDictionary()
+
     @property
     def url(self) -> str:
-        if not self.query:
-            return f'{self.endpoint}{self.path}'
-        return f'{self.endpoint}{self.path}?{self.query.urlencode()}'
+        if self._query is not None:
+            encoded = self._query.urlencode()
+        elif (encoded := self._encoded) is None:
+            encoded = self._encoded = urlencode([(k, v) for k, values in self._params.items() for v in values])
+        return f'{self._base}?{encoded}' if encoded else self._base
+
+    @property
+    def query(self) -> QueryDict:
+        """
+        URL 查询参数。首次访问时才构造 :class:`QueryDict` ，由于它可以被修改，此后 :attr:`url` 不再缓存编码结果。
+        """
+        if self._query is None:
+            self._query = QueryDict(mutable=True)
+            for k, values in self._params.items():
+                self._query.setlist(k, values)
+        return self._query
+
+    @query.setter
+    def query(self, params: str | dict | QueryDict | None):
+        self._query = self._standardize(params)
 
     def __init__(
         self,
@@ -28,30 +387,663 @@ class ServiceRequest(ABC):
         path: str,
         **kwargs,
     ):
+        template = self._templates.get((self.endpoint, method, path)) or self._template(method, path)
+        self.method: Literal['CONNECT', 'DELETE', 'GET', 'HEAD', 'OPTIONS', 'PATCH', 'POST', 'PUT', 'TRACE']
+        self.method, self._base = template
+        self.path = path
+        self.headers = kwargs.pop('headers', {}) or {}
+        self._params = self._lists(kwargs.pop('params', None))
+        self._query: QueryDict | None = None
+        self._encoded: str | None = None
+        self.data = dict(kwargs.get('data', {}))  # 传递给底层推断 Accept 头
+        self.data.update(kwargs.get('json', {}))
+        self.kwargs = kwargs
+        self._sampled: bool | None = None
+
+    @classmethod
+    def _template(cls, method: HTTPMethod | str, path: str) -> tuple[str, str]:
+        """
+        校验并规范化请求方法与路径，得到（方法，不含查询参数的 URL），同一服务的相同方法与路径只需要校验一次。
+        """
         assert method.lower() in View.http_method_names
         assert path.startswith('/')
-        assert not self.endpoint.endswith('/')
+        assert not cls.endpoint.endswith('/')
         match method:
             case 'CONNECT' | 'DELETE' | 'GET' | 'HEAD' | 'OPTIONS' | 'PATCH' | 'POST' | 'PUT' | 'TRACE':
-                self.method = method
+                template = method, f'{cls.endpoint}{path}'
             case HTTPMethod():
-                self.method = str(method.name)
+                template = str(method.name), f'{cls.endpoint}{path}'
             case _:
                 raise ValueError('HTTP 方法必须是一个字面量或枚举。')
-        self.method: Literal['CONNECT', 'DELETE', 'GET', 'HEAD', 'OPTIONS', 'PATCH', 'POST', 'PUT', 'TRACE']
-        self.path = path
-        self.headers = kwargs.pop('headers', {}) or {}
-        self.query = self._standardize(kwargs.pop('params', {}))
-        self.data = dict(kwargs.get('data', {}))  # 传递给底层推断 Accept 头
-        self.data.update(kwargs.get('json', {}))
-        self.kwargs = kwargs
+        # 路径中含有 ID 等变量时，模板数量没有上限，因此只缓存一部分。
+        if len(cls._templates) < 1024:
+            cls._templates[(cls.endpoint, method, path)] = template
+        return template
+
+    @classmethod
+    def _lists(cls, params: str | dict | QueryDict | None) -> dict[str, list]:
+        """
+        把查询参数整理为“键－值列表”的字典。普通字典不需要经过 :class:`QueryDict` 。
+        """
+        if type(params) is not dict:
+            return dict(cls._standardize(params).lists())
+        lists = {}
+        for k, v in params.items():
+            match v:
+                case list() | tuple() | set():
+                    lists[k] = list(v)
+                case _:
+                    lists[k] = [v]
+        return lists
 
     @abstractmethod
     def send(self):
         raise NotImplementedError
 
-    def _request(self) -> requests.Response:
-        return requests.request(self.method, self.url, headers=self.headers, **self.kwargs)
+    async def asend(self):
+        """
+        :meth:`send` 的异步版本。
+        """
+        raise NotImplementedError
+
+    def _logging(self, logger: Logger, level: int = INFO) -> bool:
+        """
+        是否需要记录当前请求的日志。每个请求只抽样一次，因此请求与响应的日志总是成对出现。
+        """
+        if not logger.isEnabledFor(level):
+            return False
+        if self._sampled is None:
+            self._sampled = self.log_rate >= 1 or random() < self.log_rate
+        return self._sampled
+
+    def _redact(self, items: Iterable[tuple[str, Any]]) -> dict[str, Any]:
+        return {k: '***' if k.lower() in self.redacted else v for k, v in items}
+
+    def _redacted_url(self) -> str:
+        """
+        隐去敏感查询参数后的 :attr:`url` 。
+        """
+        lists = self._query.lists() if self._query is not None else self._params.items()
+        pairs = [(k, '***' if k.lower() in self.redacted else v) for k, values in lists for v in values]
+        return f'{self._base}?{urlencode(pairs, safe="*")}' if pairs else self._base
+
+    def _log_request(self, logger: Logger) -> None:
+        """
+        记录请求日志。只有日志级别启用且被抽样时，才会构造日志内容。
+        """
+        if not self._logging(logger):
+            return
+        url = self._redacted_url()
+        extra = {
+            'method': self.method,
+            'url': url,
+            'headers': self._redact(self.headers.items()),
+            'body': self._redact(self.data.items()),
+        }
+        logger.info('%s：%s %s', self.label, self.method, url, extra={'request': extra})
+
+    def _log_response(self, logger: Logger, response, body: dict | None = None) -> None:
+        """
+        记录响应日志。只有日志级别启用且被抽样时，才会构造日志内容。
+
+        :param response: ``requests`` 或 ``httpx`` 的响应。
+        :param body: 已经解析的响应体。提供时按字段隐去敏感值，否则截取响应文本。
+        """
+        if not self._logging(logger):
+            return
+        if body is None:
+            shown = response.content[: self.log_limit].decode(response.encoding or 'utf-8', errors='replace')
+        else:
+            shown = str(self._redact(body.items()))[: self.log_limit]
+        extra = {
+            'method': self.method,
+            'url': self._redacted_url(),
+            'status': response.status_code,
+            'elapsed': response.elapsed.total_seconds(),
+            'size': len(response.content),
+            'body': shown,
+        }
+        logger.info(
+            '%s：%s %s %d %.0fms %s',
+            self.label,
+            self.method,
+            extra['url'],
+            extra['status'],
+            extra['elapsed'] * 1000,
+            shown,
+            extra={'response': extra},
+        )
+
+    def _log_error(self, logger: Logger, exc: BaseException) -> None:
+        """
+        记录请求失败的日志。
+
+        ``requests``、``urllib3`` 与 ``httpx`` 的异常信息会带上完整的请求 URL（包括密钥等查询参数），
+        因此只记录异常类型与去掉了查询参数的异常信息，不记录原始的异常堆栈。
+        """
+        message = _QUERY.sub('?***', str(exc))
+        extra = {'method': self.method, 'url': self._redacted_url(), 'error': type(exc).__name__, 'message': message}
+        logger.error(
+            '%s：%s %s ERROR %s: %s',
+            self.label,
+            self.method,
+            extra['url'],
+            extra['error'],
+            message,
+            extra={'request': extra},
+        )
+
+    @classmethod
+    def session(cls) -> requests.Session:
+        """
+        当前服务在当前进程中共享的会话。
+
+        - 会话按类区分，子类可以通过类属性配置各自的连接池、超时与重试；
+        - 会话按进程区分，``fork`` 出的子进程不会与父进程共用连接；
+        - 会话不保存 Cookie，与每次调用 ``requests.request()`` 的行为一致，也因此可以在线程间共享。
+        """
+        key = cls, getpid()
+        if (session := cls._sessions.get(key)) is not None:
+            return session
+        with cls._sessions_lock:
+            if (session := cls._sessions.get(key)) is None:
+                session = cls._sessions[key] = cls._build_session()
+        return session
+
+    @classmethod
+    def _build_session(cls) -> requests.Session:
+        retry = Retry(
+            total=cls.retries,
+            connect=cls.retries,
+            read=0,
+            status=0,
+            backoff_factor=0.1,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_maxsize=cls.pool_maxsize, max_retries=retry, pool_block=cls.pool_block)
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not cls.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def _limiters(self) -> list[RateLimiter]:
+        limiters = [self.limiter] if self.limiter else []
+        if (limiter := self.limiters.get(self.path)) is not None:
+            limiters.append(limiter)
+        return limiters
+
+    def _request(self, stream: bool = False, *, limited: bool = True) -> requests.Response:
+        if limited:
+            for limiter in self._limiters():
+                limiter.acquire()
+        kwargs = {'timeout': self.timeout, **self.kwargs}
+        return self.session().request(self.method, self.url, headers=self.headers, stream=stream, **kwargs)
+
+    def _call(self, *, limited: bool = True) -> requests.Response:
+        """
+        真正向上游发出一次请求，并把结果记入 :attr:`breaker` 。合并的请求只有真正发出请求的那一个会经过这里。
+        """
+        try:
+            response = self._request(limited=limited)
+        except MeowViewException:
+            raise
+        except Exception:
+            if self.breaker:
+                self.breaker.fail()
+            raise
+        if self.breaker and response.status_code >= 500:
+            self.breaker.fail()
+        elif self.breaker:
+            self.breaker.succeed()
+        return response
+
+    async def _acall(self, *, limited: bool = True) -> 'httpx.Response':
+        """
+        :meth:`_call` 的异步版本。
+        """
+        try:
+            response = await self._arequest(limited=limited)
+        except (MeowViewException, TypeError):
+            # 参数错误（比如 httpx 不支持按请求传递的参数）不是上游的故障。
+            raise
+        except Exception:
+            if self.breaker:
+                self.breaker.fail()
+            raise
+        if self.breaker and response.status_code >= 500:
+            self.breaker.fail()
+        elif self.breaker:
+            self.breaker.succeed()
+        return response
+
+    def _secret(self) -> bool:
+        """
+        请求是否带有 :attr:`redacted` 中的查询参数或请求头。
+        """
+        names = self._query.keys() if self._query is not None else self._params.keys()
+        return any(k.lower() in self.redacted for k in [*names, *self.headers])
+
+    def _coalesce_key(self) -> str | None:
+        """
+        合并请求所用的键，由方法、URL、请求头与请求体决定；不需要合并时返回 ``None`` 。
+        """
+        if not self.coalesce or self.method not in RetryPolicy.IDEMPOTENT:
+            return None
+        digest = blake2b(self.url.encode(), digest_size=16)
+        digest.update(repr(sorted(self.headers.items())).encode())
+        digest.update(repr(self.kwargs.get('data')).encode())
+        digest.update(json.dumps(self.kwargs.get('json'), sort_keys=True, default=str).encode())
+        return f'request:{self.method}:{digest.hexdigest()}'
+
+    def _coalesced(self):
+        """
+        按 :attr:`coalesce` 与 :attr:`coalesce_ttl` 合并相同的请求，返回 ``requests`` 的响应。
+        """
+        if (key := self._coalesce_key()) is None:
+            # 不合并的请求已经在 _retrying() 中通过了限流器。
+            return self._call(limited=False)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            response = self._shared(key)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _shared(self, key: str):
+        if self.coalesce_ttl <= 0 or self._secret():
+            return self._call()
+        if (snapshot := cacher[key]) is not None:
+            return _restore(snapshot)
+        with cacher.lock(key, timeout=self._lock_timeout(), wait=self._lock_timeout()) as locked:
+            if (snapshot := cacher[key]) is not None:
+                return _restore(snapshot)
+            response = self._call()
+            if locked and response.status_code < 400:
+                cacher[key, self.coalesce_ttl] = _snapshot(response)
+            return response
+
+    async def _acoalesced(self):
+        """
+        :meth:`_coalesced` 的异步版本，返回 ``httpx`` 的响应。进程内的合并按事件循环区分。
+        """
+        if (key := self._coalesce_key()) is None:
+            return await self._acall(limited=False)
+        inflight = self._ainflight.setdefault(get_running_loop(), {})
+        while (future := inflight.get(key)) is not None:
+            if (response := await shield(future)) is not _ABANDONED:
+                return response
+        future = inflight[key] = get_running_loop().create_future()
+        try:
+            response = await self._ashared(key)
+        except CancelledError:
+            # 只取消当前请求，等待它的请求由其中一个接替发出。
+            future.set_result(_ABANDONED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 没有其它请求在等待时，避免“exception was never retrieved”的警告。
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            inflight.pop(key, None)
+
+    async def _ashared(self, key: str):
+        if self.coalesce_ttl <= 0 or self._secret():
+            return await self._acall()
+        if (snapshot := await cacher.aget(key)) is not None:
+            return _restore(snapshot)
+        async with cacher.lock(key, timeout=self._lock_timeout(), wait=self._lock_timeout()) as locked:
+            if (snapshot := await cacher.aget(key)) is not None:
+                return _restore(snapshot)
+            response = await self._acall()
+            if locked and response.status_code < 400:
+                await cacher.aset(key, _snapshot(response), self.coalesce_ttl)
+            return response
+
+    def _lock_timeout(self) -> int:
+        # 持有锁的进程最多阻塞一次请求的时长，超过后其它进程各自发出请求。
+        match self.kwargs.get('timeout', self.timeout):
+            case (connect, read):
+                return int(connect + read) + 1
+            case None:
+                return 30
+            case timeout:
+                return int(timeout) + 1
+
+    def _errcode(self, result) -> int | None:
+        """
+        从解析后的响应中取出业务错误码，供 :attr:`RetryPolicy.errcodes` 判断。
+        """
+        return None
+
+    def _retrying(self, parse: Callable[[Any], R]) -> R:
+        """
+        按照 :attr:`retry`（或 :attr:`retry_policies`）与 :attr:`breaker` 发出请求，并用 ``parse`` 解析响应。熔断器的结果在 :meth:`_call` 中记录，
+        因此合并的请求无论有多少个，一次上游请求只记一次。
+
+        网络错误会原样抛出；熔断器断开时抛出错误码为 ``Errcode.DEPENDENCE_UNAVAILABLE`` 的 :class:`MeowViewException` 。
+        """
+        policy = self.retry_policies.get(self.path, self.retry)
+        attempts = policy.attempts if policy else 1
+        # 合并的请求只有真正发出的那一个会通过限流器，因此只能在 _coalesced() 中检查。
+        limiters = self._limiters() if self._coalesce_key() is None else []
+        attempt = 0
+        while True:
+            attempt += 1
+            last = attempt >= attempts
+            # 先通过限流器再检查熔断器，避免被限流的请求占用探测的机会。
+            for limiter in limiters:
+                limiter.acquire()
+            probe = self.breaker.check() if self.breaker else False
+            try:
+                response = self._coalesced()
+            except MeowViewException:
+                raise
+            except Exception as e:
+                if last or not policy.on_error(self.method, e):
+                    raise
+            else:
+                if last or not policy.on_status(self.method, response.status_code):
+                    result = parse(response)
+                    if last or self._errcode(result) not in policy.errcodes:
+                        return result
+            finally:
+                # 探测请求被限流、被取消（CancelledError 不是 Exception）、共用了其它请求的响应等情况下，结果没有被记录。
+                if probe:
+                    self.breaker.abandon()
+            sleep(policy.delay(attempt))
+
+    async def _aretrying(self, parse: Callable[[Any], R]) -> R:
+        """
+        :meth:`_retrying` 的异步版本。
+        """
+        policy = self.retry_policies.get(self.path, self.retry)
+        attempts = policy.attempts if policy else 1
+        # 合并的请求只有真正发出的那一个会通过限流器，因此只能在 _acoalesced() 中检查。
+        limiters = self._limiters() if self._coalesce_key() is None else []
+        attempt = 0
+        while True:
+            attempt += 1
+            last = attempt >= attempts
+            # 先通过限流器再检查熔断器，避免被限流的请求占用探测的机会。
+            for limiter in limiters:
+                await limiter.aacquire()
+            probe = self.breaker.check() if self.breaker else False
+            try:
+                response = await self._acoalesced()
+            except (MeowViewException, TypeError):
+                raise
+            except Exception as e:
+                if last or not policy.on_error(self.method, e):
+                    raise
+            else:
+                if last or not policy.on_status(self.method, response.status_code):
+                    result = parse(response)
+                    if last or self._errcode(result) not in policy.errcodes:
+                        return result
+            finally:
+                # 探测请求被限流、被取消（CancelledError 不是 Exception）、共用了其它请求的响应等情况下，结果没有被记录。
+                if probe:
+                    self.breaker.abandon()
+            await asleep(policy.delay(attempt))
+
+    @classmethod
+    def semaphore(cls) -> BoundedSemaphore | nullcontext:
+        """
+        限制当前服务在当前进程中的并发数，未配置 :attr:`concurrency` 时不作限制。
+        """
+        if cls.concurrency is None:
+            return nullcontext()
+        key = cls, getpid()
+        if (semaphore := cls._semaphores.get(key)) is None:
+            with cls._sessions_lock:
+                semaphore = cls._semaphores.setdefault(key, BoundedSemaphore(cls.concurrency))
+        return semaphore
+
+    @classmethod
+    def async_semaphore(cls) -> AsyncSemaphore | nullcontext:
+        """
+        :meth:`semaphore` 的异步版本，按事件循环区分。
+        """
+        if cls.concurrency is None:
+            return nullcontext()
+        semaphores = cls._async_semaphores.setdefault(get_running_loop(), {})
+        return semaphores.setdefault(cls, AsyncSemaphore(cls.concurrency))
+
+    @classmethod
+    def client(cls) -> 'httpx.AsyncClient':
+        """
+        当前服务在当前事件循环中共享的异步客户端，需要安装 `httpx <https://pypi.org/project/httpx/>`_ 。
+
+        与 :meth:`session` 一样按类区分、复用连接且不保存 Cookie；由于连接与事件循环绑定，因此按事件循环区分。
+        """
+        clients = cls._clients.setdefault(get_running_loop(), {})
+        if (client := clients.get(cls)) is None:
+            client = clients[cls] = cls._build_client()
+        return client
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """
+        关闭当前服务及其子类在当前事件循环中的异步客户端，释放其中的连接。
+
+        应当在事件循环结束前调用，比如 ASGI 的 ``lifespan.shutdown`` 或 ``asyncio.run()`` 的主协程退出前；
+        之后再发出请求会创建新的客户端。
+        """
+        clients = cls._clients.get(get_running_loop(), {})
+        for service in [service for service in clients if issubclass(service, cls)]:
+            await clients.pop(service).aclose()
+
+    @classmethod
+    def _build_client(cls) -> 'httpx.AsyncClient':
+        import httpx
+
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=cls.pool_maxsize,
+                max_keepalive_connections=cls.pool_maxsize if cls.keep_alive else 0,
+            ),
+            timeout=cls._httpx_timeout(cls.timeout),
+            transport=httpx.AsyncHTTPTransport(retries=cls.retries),
+        )
+        client.cookies.jar.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return client
+
+    @staticmethod
+    def _httpx_timeout(timeout: float | tuple[float, float] | None) -> 'httpx.Timeout':
+        import httpx
+
+        match timeout:
+            case (connect, read):
+                return httpx.Timeout(read, connect=connect)
+            case _:
+                return httpx.Timeout(timeout)
+
+    async def _arequest(self, stream: bool = False, *, limited: bool = True) -> 'httpx.Response':
+        if limited:
+            for limiter in self._limiters():
+                await limiter.aacquire()
+        # 把 requests 风格的参数翻译为 httpx 风格。
+        kwargs = dict(self.kwargs)
+        if unsupported := sorted(kwargs.keys() & _CLIENT_OPTIONS):
+            # httpx 只能在客户端上配置这些选项，而客户端由同一服务的所有请求共用。
+            raise TypeError(f'异步请求不支持参数 {", ".join(unsupported)}，请在子类的 _build_client() 中配置')
+        if 'timeout' in kwargs:
+            kwargs['timeout'] = self._httpx_timeout(kwargs['timeout'])
+        follow_redirects = kwargs.pop('allow_redirects', None)
+        if isinstance(kwargs.get('data'), str | bytes):
+            kwargs['content'] = kwargs.pop('data')
+        client = self.client()
+        request = client.build_request(self.method, self.url, headers=self.headers, **kwargs)
+        if follow_redirects is None:
+            return await client.send(request, stream=stream)
+        return await client.send(request, stream=stream, follow_redirects=follow_redirects)
+
+    def _too_large(self) -> MeowViewException:
+        return MeowViewException(code=Errcode.DEPENDENCE_ERROR, msg='上游服务的响应过大', limit=self.max_body)
+
+    @staticmethod
+    def _content_length(response) -> int | None:
+        """
+        解码后的响应体长度。``stream()`` 返回的是解压后的字节，
+        而压缩过的响应（比如 ``Content-Encoding: gzip``）的 ``Content-Length`` 是压缩后的长度，因此视为未知。
+        """
+        if response.headers.get('Content-Encoding', 'identity').lower() != 'identity':
+            return None
+        length = response.headers.get('Content-Length')
+        return int(length) if length and length.isdigit() else None
+
+    def _opened(self, response):
+        # 状态码与 Content-Length 在读取响应体之前就能检查。
+        if response.status_code >= 400:
+            raise MeowViewException(code=Errcode.DEPENDENCE_ERROR, http=response.status_code)
+        length = self._content_length(response)
+        if self.max_body is not None and length is not None and length > self.max_body:
+            raise self._too_large()
+        return response
+
+    def open(self) -> requests.Response:
+        """
+        以流式读取的方式发出请求，只读取响应头。响应体需要通过 :meth:`stream` 读取，或者自行关闭响应。
+
+        流式请求不会重试，也不会合并，但仍然受限流器约束。
+        """
+        response = self._request(stream=True)
+        try:
+            return self._opened(response)
+        except MeowViewException:
+            response.close()
+            raise
+
+    def stream(self, chunk_size: int = 64 * 1024, response: requests.Response | None = None) -> Iterator[bytes]:
+        """
+        分块读取响应体，内存占用与响应大小无关。读取完毕、中途出错或者迭代器被关闭时，都会关闭响应。
+
+        :param chunk_size: 每一块的字节数。
+        :param response: :meth:`open` 返回的响应，不提供则立即发出请求。
+        """
+        response = response or self.open()
+        received = 0
+        try:
+            for chunk in response.iter_content(chunk_size):
+                received += len(chunk)
+                if self.max_body is not None and received > self.max_body:
+                    raise self._too_large()
+                yield chunk
+        finally:
+            response.close()
+
+    def read(self) -> bytes:
+        """
+        读取整个响应体，但不超过 :attr:`max_body` 。
+        """
+        return b''.join(self.stream())
+
+    def iter_json(self, prefix: str = 'item', chunk_size: int = 64 * 1024) -> Iterator[Any]:
+        """
+        边读取边解析 JSON 响应，逐个返回 ``prefix`` 处的元素，需要安装可选依赖 ``stream``（`ijson <https://pypi.org/project/ijson/>`_）。
+
+        :param prefix: ijson 的路径前缀，比如 ``item`` 表示顶层数组的元素，``data.item`` 表示 ``data`` 数组的元素。
+        """
+        import ijson
+
+        chunks = self.stream(chunk_size)
+        try:
+            yield from ijson.items(_ChunkReader(chunks), prefix)
+        finally:
+            chunks.close()
+
+    def streaming_response(self, chunk_size: int = 64 * 1024, **kwargs) -> StreamingHttpResponse:
+        """
+        把上游响应原样转发给客户端，不在内存中缓冲整个响应体。
+
+        上游压缩过的响应会被解压后转发，因此只在未压缩时沿用上游的 ``Content-Length`` 。
+
+        :param kwargs: 传递给 :class:`StreamingHttpResponse` 的其它参数，默认沿用上游的 ``Content-Type`` 。
+        """
+        response = self.open()
+        kwargs.setdefault('content_type', response.headers.get('Content-Type'))
+        streaming = StreamingHttpResponse(self.stream(chunk_size, response), **kwargs)
+        if (length := self._content_length(response)) is not None:
+            streaming['Content-Length'] = length
+        return streaming
+
+    async def aopen(self) -> 'httpx.Response':
+        """
+        :meth:`open` 的异步版本。
+        """
+        response = await self._arequest(stream=True)
+        try:
+            return self._opened(response)
+        except MeowViewException:
+            await response.aclose()
+            raise
+
+    async def astream(
+        self,
+        chunk_size: int = 64 * 1024,
+        response: 'httpx.Response | None' = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        :meth:`stream` 的异步版本。
+        """
+        response = response or await self.aopen()
+        received = 0
+        try:
+            async for chunk in response.aiter_bytes(chunk_size):
+                received += len(chunk)
+                if self.max_body is not None and received > self.max_body:
+                    raise self._too_large()
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def aread(self) -> bytes:
+        """
+        :meth:`read` 的异步版本。
+        """
+        return b''.join([chunk async for chunk in self.astream()])
+
+    async def aiter_json(self, prefix: str = 'item', chunk_size: int = 64 * 1024) -> AsyncIterator[Any]:
+        """
+        :meth:`iter_json` 的异步版本。
+        """
+        import ijson
+
+        chunks = self.astream(chunk_size)
+        try:
+            async for item in ijson.items(_AsyncChunkReader(chunks), prefix):
+                yield item
+        finally:
+            await chunks.aclose()
+
+    async def astreaming_response(self, chunk_size: int = 64 * 1024, **kwargs) -> StreamingHttpResponse:
+        """
+        :meth:`streaming_response` 的异步版本，适用于 ASGI。
+        """
+        response = await self.aopen()
+        kwargs.setdefault('content_type', response.headers.get('Content-Type'))
+        streaming = StreamingHttpResponse(self.astream(chunk_size, response), **kwargs)
+        if (length := self._content_length(response)) is not None:
+            streaming['Content-Length'] = length
+        return streaming
 
     @classmethod
     def _query_from_dict(cls, params: dict, base: QueryDict | None = None) -> QueryDict:
@@ -92,3 +1084,145 @@ class ServiceRequest(ABC):
     @abstractmethod
     def post(cls, api: str, **kwargs):
         raise NotImplementedError
+
+    @classmethod
+    async def aget(cls, api: str, **kwargs):
+        """
+        :meth:`get` 的异步版本。
+        """
+        raise NotImplementedError
+
+    @classmethod
+    async def apost(cls, api: str, **kwargs):
+        """
+        :meth:`post` 的异步版本。
+        """
+        raise NotImplementedError
+
+
+_TRANSFER_HEADERS = frozenset({'content-encoding', 'content-length', 'transfer-encoding'})
+
+_ABANDONED = object()
+"""合并请求时，发出请求的协程被取消，等待它的协程需要接替发出请求。"""
+
+_CLIENT_OPTIONS = frozenset({'cert', 'proxies', 'verify'})
+"""``requests`` 可以按请求传递、``httpx`` 只能在客户端上配置的参数。"""
+
+
+def _snapshot(response) -> tuple[int, dict[str, str], bytes]:
+    """
+    跨进程合并时写入缓存的响应：只保留状态码、响应头与响应体，不包括请求的 URL 、请求头与请求体。
+    """
+    # 响应体已经解压，长度与编码相关的响应头不再适用。
+    headers = {k: v for k, v in response.headers.items() if k.lower() not in _TRANSFER_HEADERS}
+    return response.status_code, headers, response.content
+
+
+def _restore(snapshot: tuple[int, dict[str, str], bytes]) -> requests.Response:
+    status, headers, content = snapshot
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.elapsed = timedelta(0)
+    return response
+
+
+class _ChunkReader:
+    """
+    把分块的迭代器包装为只读的类文件对象，供 ijson 读取。
+    """
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self.chunks = chunks
+
+    def read(self, size: int = -1) -> bytes:
+        # ijson 会先读取 0 个字节来判断返回的是 bytes 还是 str。
+        return next(self.chunks, b'') if size else b''
+
+
+class _AsyncChunkReader:
+    """
+    :class:`_ChunkReader` 的异步版本。
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self.chunks = chunks
+
+    async def read(self, size: int = -1) -> bytes:
+        return await anext(self.chunks, b'') if size else b''
+
+
+def _limited(request: ServiceRequest):
+    with request.semaphore():
+        return request.send()
+
+
+def _timeout_exception() -> MeowViewException:
+    return MeowViewException(code=Errcode.DEPENDENCE_TIMEOUT)
+
+
+def fanout(batch: Iterable[ServiceRequest], *, timeout: float | None = None, workers: int = 8) -> list[Any]:
+    """
+    在线程池中并发执行多个请求的 :meth:`ServiceRequest.send` ，总耗时取决于最慢的请求而非所有请求之和。
+
+    - 结果按请求的顺序返回；请求抛出的异常会放在结果中对应的位置，而不是直接抛出；
+    - 超过 ``timeout`` 仍未完成的请求，对应位置是错误码为 ``Errcode.DEPENDENCE_TIMEOUT`` 的
+      :class:`MeowViewException`，但不会中断已经发出的请求；
+    - 同一服务的并发数受其 :attr:`ServiceRequest.concurrency` 限制。
+
+    :param batch: 请求对象。
+    :param timeout: 整批请求的截止秒数，``None`` 表示一直等待。
+    :param workers: 最多同时执行多少个请求。
+    :return: 响应或异常组成的列表。
+    """
+    batch = list(batch)
+    if not batch:
+        return []
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(batch)), thread_name_prefix='fanout')
+    try:
+        futures = [executor.submit(_limited, request) for request in batch]
+        wait(futures, timeout=timeout)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    results = []
+    for future in futures:
+        if not future.done() or future.cancelled():
+            results.append(_timeout_exception())
+        elif (e := future.exception()) is not None:
+            results.append(e)
+        else:
+            results.append(future.result())
+    return results
+
+
+async def _alimited(request: ServiceRequest):
+    async with request.async_semaphore():
+        return await request.asend()
+
+
+async def afanout(batch: Iterable[ServiceRequest], *, timeout: float | None = None) -> list[Any]:
+    """
+    :func:`fanout` 的异步版本，在当前事件循环中并发执行多个请求的 :meth:`ServiceRequest.asend` 。
+
+    超过 ``timeout`` 仍未完成的请求会被取消。
+    """
+    tasks = [ensure_future(_alimited(request)) for request in batch]
+    if not tasks:
+        return []
+    _, pending = await async_wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        # 等待取消完成，让被取消的请求执行完清理（关闭连接、放弃熔断器的探测等）再返回。
+        await async_wait(pending)
+    results = []
+    for task in tasks:
+        if task in pending:
+            results.append(_timeout_exception())
+        elif (e := task.exception()) is not None:
+            results.append(e)
+        else:
+            results.append(task.result())
+    return results